@@ -1,24 +1,28 @@
 import ast
+import collections
 import ctypes
-import io
 import json
+import multiprocessing
 import os
 import re
 import sys
 import threading
+import time
 import uuid
 import webbrowser
-import zlib
 
-from PIL import Image, ImageTk
-from dissect import cstruct
-import keyboard
-from screeninfo import get_monitors
 import tkinter as tk
 from tkinter import filedialog, font
 from tkinter import ttk
 from ttkthemes import ThemedTk
 
+from odl import (PATTERN_KINDS, ODLGroup, Profile, RecordExporter, StructCache, StructReport,
+                 StructLibrary, compile_patterns, find_logs, format_time, parse_time, pattern_sources)
+
+if __name__ == '__main__':
+    # Worker processes of a frozen build run their task here and exit
+    multiprocessing.freeze_support()
+
 # Per monitor DPI aware. This app checks for the DPI when it is
 # created and adjusts the scale factor whenever the DPI changes.
 # These applications are not automatically scaled by the system.
@@ -36,6 +40,10 @@ GWL_STYLE = -16
 WS_MINIMIZEBOX = 131072
 WS_MAXIMIZEBOX = 65536
 
+# Runs of up to three ANSI escape sequences, which is how dumpstruct
+# colors its output. Splitting on it yields text, escapes, text, ...
+ANSI_ESCAPE = re.compile(r'((?:\x1B(?:[@-Z\-_]|\[[0-?]*[ -/]*[@-~])){1,3})')
+
 theme_data = None
 __author__ = "Brian Maloney"
 __version__ = "2024.06.11"
@@ -259,7 +267,7 @@ class About:
     def create_widgets(self):
         self.frame = ttk.Frame(self.win)
         self.label = ttk.Label(self.frame,
-                               image=self.parent.lyman_img,
+                               image=self.parent.lyman_image(),
                                anchor='n')
         self.label1 = ttk.Label(self.frame,
                                 text="Lyman",
@@ -340,6 +348,200 @@ class About:
         self.win.destroy()
 
 
+class ProfileDialog:
+    """Timings of the stages of the last load, and of searches and tests
+    since, as recorded with Options > Profile loading."""
+
+    def __init__(self, root, parent):
+        self.root = root
+        self.parent = parent
+        self.win = tk.Toplevel(self.root)
+        self.win.wm_transient(self.root)
+        self.win.title("Loading profile")
+        self.win.iconbitmap(application_path + '/Lyman/favicon.ico')
+        self.win.focus_force()
+        self.win.resizable(False, False)
+        self.win.protocol("WM_DELETE_WINDOW", self.close_profile)
+        self.configure_window()
+        self.create_widgets()
+        self.refresh()
+
+    def configure_window(self):
+        hwnd = get_parent(self.win.winfo_id())
+        old_style = get_window_long(hwnd, GWL_STYLE)
+        new_style = old_style & ~WS_MAXIMIZEBOX & ~WS_MINIMIZEBOX
+        set_window_long(hwnd, GWL_STYLE, new_style)
+
+    def create_widgets(self):
+        self.frame = ttk.Frame(self.win)
+        self.text = tk.Text(self.frame,
+                            width=90,
+                            height=24,
+                            wrap=tk.NONE,
+                            font=('Consolas', 10, 'normal'))
+        self.scrollbv = ttk.Scrollbar(self.frame,
+                                      orient="vertical",
+                                      command=self.text.yview)
+        self.text.configure(yscrollcommand=self.scrollbv.set)
+        self.refresh_button = ttk.Button(self.frame,
+                                         text="Refresh",
+                                         takefocus=False,
+                                         command=self.refresh)
+        self.export_button = ttk.Button(self.frame,
+                                        text="Export JSON",
+                                        takefocus=False,
+                                        command=self.export_json)
+        self.ok = ttk.Button(self.frame,
+                             text="OK",
+                             takefocus=False,
+                             command=self.close_profile)
+
+        self.frame.grid(row=0, column=0)
+        self.text.grid(row=0, column=0, columnspan=3, padx=(10, 0), pady=(10, 0))
+        self.scrollbv.grid(row=0, column=3, padx=(0, 10), pady=(10, 0), sticky="ns")
+        self.refresh_button.grid(row=1, column=0, padx=(10, 0), pady=10, sticky='w')
+        self.export_button.grid(row=1, column=1, pady=10, sticky='e')
+        self.ok.grid(row=1, column=2, padx=(5, 0), pady=10, sticky='e')
+
+    def refresh(self):
+        profile = self.parent.odl.profile
+        self.text.config(state='normal')
+        self.text.delete(1.0, tk.END)
+        if profile is None:
+            self.text.insert(tk.END, "Nothing profiled. Turn on Options > Profile loading and load a log.")
+        else:
+            self.text.insert(tk.END, profile.format())
+        self.text.config(state='disabled')
+        self.export_button.config(state='normal' if profile is not None else 'disabled')
+
+    def export_json(self):
+        filename = filedialog.asksaveasfilename(parent=self.win,
+                                                title="Export profile",
+                                                defaultextension=".json",
+                                                filetypes=(("JSON file", "*.json"),))
+        if filename:
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(self.parent.odl.profile.to_json())
+
+    def close_profile(self):
+        self.win.destroy()
+
+
+class CountsDialog:
+    """How often every function of the loaded logs fired and how long its
+    params are, as counted while the logs were scanned. Clicking a heading
+    sorts by it, double-clicking a function selects it in the Search
+    pane."""
+
+    columns = (('code_file', 'Code_File', 180, 'w'),
+               ('function', 'Function', 260, 'w'),
+               ('flags', 'Flags', 50, 'center'),
+               ('count', 'Count', 80, 'e'),
+               ('smallest', 'Min', 60, 'e'),
+               ('largest', 'Max', 60, 'e'),
+               ('mean', 'Mean', 70, 'e'),
+               ('histogram', 'Params lengths', 260, 'w'))
+
+    def __init__(self, root, parent):
+        self.root = root
+        self.parent = parent
+        self.win = tk.Toplevel(self.root)
+        self.win.wm_transient(self.root)
+        self.win.title("Function counts")
+        self.win.iconbitmap(application_path + '/Lyman/favicon.ico')
+        self.win.focus_force()
+        self.win.resizable(False, False)
+        self.win.protocol("WM_DELETE_WINDOW", self.close_counts)
+        self.configure_window()
+        # (code_file, function, flags) -> PayloadSizes
+        self.sizes = self.parent.odl.payload_sizes()
+        self.sort_column = 'count'
+        self.descending = True
+        self.create_widgets()
+        self.populate()
+
+    def configure_window(self):
+        hwnd = get_parent(self.win.winfo_id())
+        old_style = get_window_long(hwnd, GWL_STYLE)
+        new_style = old_style & ~WS_MAXIMIZEBOX & ~WS_MINIMIZEBOX
+        set_window_long(hwnd, GWL_STYLE, new_style)
+
+    def create_widgets(self):
+        self.frame = ttk.Frame(self.win)
+        self.tree = ttk.Treeview(self.frame,
+                                 columns=[column for column, *_ in self.columns],
+                                 show='headings',
+                                 height=24,
+                                 selectmode='browse')
+        for column, heading, width, anchor in self.columns:
+            self.tree.heading(column, text=heading,
+                              command=lambda column=column: self.sort_by(column))
+            self.tree.column(column, width=width, anchor=anchor, stretch=False)
+        self.scrollbv = ttk.Scrollbar(self.frame,
+                                      orient="vertical",
+                                      command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.scrollbv.set)
+        self.total_label = ttk.Label(self.frame, takefocus=False)
+        self.ok = ttk.Button(self.frame,
+                             text="OK",
+                             takefocus=False,
+                             command=self.close_counts)
+        self.tree.bind('<Double-Button-1>', self.select_function)
+
+        self.frame.grid(row=0, column=0)
+        self.tree.grid(row=0, column=0, columnspan=2, padx=(10, 0), pady=(10, 0))
+        self.scrollbv.grid(row=0, column=2, padx=(0, 10), pady=(10, 0), sticky="ns")
+        self.total_label.grid(row=1, column=0, padx=(10, 0), pady=10, sticky='w')
+        self.ok.grid(row=1, column=1, pady=10, sticky='e')
+
+    def sort_key(self, item):
+        (code_file, function, flags), payload = item
+        if self.sort_column == 'code_file':
+            return code_file.lower(), function.lower(), flags
+        if self.sort_column == 'function':
+            return function.lower(), code_file.lower(), flags
+        if self.sort_column == 'flags':
+            return flags, code_file.lower(), function.lower()
+        if self.sort_column == 'histogram':
+            # Fixed-size payloads together, then by how much they vary
+            return payload.largest - payload.smallest, payload.mean
+        return getattr(payload, self.sort_column)
+
+    def sort_by(self, column):
+        # Clicking the sorted column again reverses it, numbers sort
+        # largest first
+        if column == self.sort_column:
+            self.descending = not self.descending
+        else:
+            self.sort_column = column
+            self.descending = column in ('count', 'smallest', 'largest', 'mean')
+        self.populate()
+
+    def populate(self):
+        self.tree.delete(*self.tree.get_children())
+        for (code_file, function, flags), payload in sorted(self.sizes.items(), key=self.sort_key,
+                                                             reverse=self.descending):
+            lengths = f'fixed {payload.largest}' if payload.fixed else payload.format_histogram()
+            self.tree.insert('', tk.END, values=(code_file, function, flags, payload.count,
+                                                 payload.smallest, payload.largest,
+                                                 f'{payload.mean:.1f}', lengths))
+        for column, heading, width, anchor in self.columns:
+            arrow = (' \u25bc' if self.descending else ' \u25b2') if column == self.sort_column else ''
+            self.tree.heading(column, text=heading + arrow)
+        total = sum(payload.count for payload in self.sizes.values())
+        self.total_label.config(text=f'{len(self.sizes):,} functions, {total:,} records with params')
+
+    def select_function(self, event=None):
+        item = self.tree.focus()
+        if not item:
+            return
+        code_file, function, flags = self.tree.item(item, 'values')[:3]
+        self.parent.search_frame.select_function(code_file, function, flags)
+
+    def close_counts(self):
+        self.win.destroy()
+
+
 class SearchFrame(ttk.Frame):
     def __init__(self, master, parent, **kwargs):
         super().__init__(master, **kwargs)
@@ -352,6 +554,10 @@ class SearchFrame(ttk.Frame):
         self.cfv = tk.StringVar()
         self.funcv = tk.StringVar()
         self.flagsv = tk.StringVar()
+        self.startv = tk.StringVar()
+        self.endv = tk.StringVar()
+        self.patternv = tk.StringVar()
+        self.pattern_kindv = tk.StringVar(value='any')
 
         self.odl_file_label = ttk.Label(self, text="ODL:", takefocus=False)
         self.code_file_label = ttk.Label(self, text="Code_File:", takefocus=False)
@@ -385,6 +591,46 @@ class SearchFrame(ttk.Frame):
                                         command=self.retrieve_values,
                                         state="disabled")
 
+        # Time window, in UTC, the catalog and samples are limited to
+        self.start_label = ttk.Label(self, text="From:", takefocus=False)
+        self.end_label = ttk.Label(self, text="To:", takefocus=False)
+        self.start_frame = tk.Frame(self, takefocus=False, bg=ttk.Style().lookup('TFrame', 'background'))
+        self.time_frame = ttk.Frame(self, takefocus=False)
+        self.end_frame = tk.Frame(self.time_frame, takefocus=False, bg=ttk.Style().lookup('TFrame', 'background'))
+        self.start_entry = ttk.Entry(self.start_frame, textvariable=self.startv, width=25)
+        self.end_entry = ttk.Entry(self.end_frame, textvariable=self.endv, width=25)
+        self.span_label = ttk.Label(self.time_frame, takefocus=False)
+
+        # Search of the params of every record for bytes, text, a GUID or a regex
+        self.find_label = ttk.Label(self, text="Find:", takefocus=False)
+        self.pattern_frame = tk.Frame(self, takefocus=False, bg=ttk.Style().lookup('TFrame', 'background'))
+        self.pattern_entry = ttk.Entry(self.pattern_frame, textvariable=self.patternv, width=53)
+        self.pattern_kind_entry = ttk.Combobox(self,
+                                               textvariable=self.pattern_kindv,
+                                               values=PATTERN_KINDS,
+                                               width=6,
+                                               state="readonly")
+        self.find_button = ttk.Button(self, text="Find", takefocus=False,
+                                      command=self.find_patterns,
+                                      state="disabled")
+        self.counts_button = ttk.Button(self, text="Counts", takefocus=False,
+                                        command=lambda: CountsDialog(self.parent.root, self.parent),
+                                        state="disabled")
+
+        # Shown while an ODL is loading, or being searched, in the background
+        self.load_thread = None
+        self.load_done = None
+        # StructLibrary the logs were last decoded with, also used to
+        # decode the records exported, and the directory it was loaded from
+        self.library = None
+        self.library_dir = None
+        # RecordExporter being written in the background
+        self.exporter = None
+        self.progress_label = ttk.Label(self, takefocus=False)
+        self.progress_bar = ttk.Progressbar(self, mode='determinate')
+        self.cancel_button = ttk.Button(self, text="Cancel", takefocus=False,
+                                        command=self.cancel_odl)
+
         self.setup_layout()
 
     def setup_layout(self):
@@ -414,6 +660,27 @@ class SearchFrame(ttk.Frame):
                               pady=(0, 5), sticky='ew')
         self.flags_entry.grid(row=0, column=0, sticky='ew')
         self.search_button.grid(row=1, column=6, pady=(0, 5), sticky='w')
+        self.start_label.grid(row=2, column=0, pady=(0, 5), sticky='e')
+        self.start_frame.grid(row=2, column=1, padx=5, pady=(0, 5), sticky='w')
+        self.start_entry.grid(row=0, column=0, sticky='ew')
+        self.end_label.grid(row=2, column=2, pady=(0, 5), sticky='e')
+        self.time_frame.grid(row=2, column=3, padx=5, pady=(0, 5), sticky='ew')
+        self.time_frame.grid_columnconfigure(1, weight=1)
+        self.end_frame.grid(row=0, column=0, sticky='w')
+        self.end_entry.grid(row=0, column=0, sticky='ew')
+        self.span_label.grid(row=0, column=1, padx=(10, 0), sticky='e')
+        self.find_label.grid(row=3, column=0, pady=(0, 5), sticky='e')
+        self.pattern_frame.grid(row=3, column=1, padx=5, pady=(0, 5), sticky='ew')
+        self.pattern_frame.grid_columnconfigure(0, weight=1)
+        self.pattern_entry.grid(row=0, column=0, sticky='ew')
+        self.pattern_kind_entry.grid(row=3, column=2, pady=(0, 5), sticky='e')
+        self.find_button.grid(row=3, column=3, padx=5, pady=(0, 5), sticky='w')
+        self.counts_button.grid(row=3, column=5, padx=5, pady=(0, 5), sticky='w')
+        self.progress_label.grid(row=4, column=0, pady=(0, 5), sticky='e')
+        self.progress_bar.grid(row=4, column=1, columnspan=4, padx=5,
+                               pady=(0, 5), sticky='ew')
+        self.cancel_button.grid(row=4, column=5, pady=(0, 5), padx=(0, 5), sticky='w')
+        self.hide_progress()
 
         # Update function options when code file changes
         self.code_file_entry.bind("<<ComboboxSelected>>", lambda e:
@@ -426,8 +693,12 @@ class SearchFrame(ttk.Frame):
         self.flags_entry.bind("<<ComboboxSelected>>", lambda e: self.onpress(e))
         
         self.odl_file_entry.bind('<Return>', lambda e: self.open_odl(ellipsis=False))
+        self.start_entry.bind('<Return>', self.apply_time_window)
+        self.end_entry.bind('<Return>', self.apply_time_window)
+        self.pattern_entry.bind('<Return>', lambda e: self.find_patterns())
 
     def onpress(self, event):
+        import keyboard  # hooks the keyboard on import, only needed from here on
         event.widget.focus_force()
         keyboard.press('right')
     
@@ -447,6 +718,9 @@ class SearchFrame(ttk.Frame):
         # If any value is empty, return
         if not (odl_value and cfv_value and funcv_value and flagsv_value):
             return
+        # Not while a background job is reading the logs
+        if self.load_thread is not None:
+            return
 
         self.odl_file_entry.config(state='disabled')
         self.odl_button.config(state='disabled')
@@ -457,40 +731,264 @@ class SearchFrame(ttk.Frame):
                                            flagsv_value)
 
     def open_odl(self, ellipsis=True):
+        # Disabling the entry does not stop Return, so not while a
+        # background job is reading the logs
+        if self.load_thread is not None:
+            return
+        # Several files, or directories of them, are separated by ';'
         if ellipsis:
-            filename = filedialog.askopenfilename(initialdir="/",
-                                                  title="Open",
-                                                  filetypes=(("ODL file",
-                                                              "*.odl *.odlgz *.odlsent *.aodl"),))
+            filenames = filedialog.askopenfilenames(initialdir="/",
+                                                    title="Open",
+                                                    filetypes=(("ODL file",
+                                                                "*.odl *.odlgz *.odlsent *.aodl"),))
+            if filenames:
+                self.odl.set('; '.join(filenames))
         else:
-            filename = self.odl.get().strip()
+            filenames = [name.strip() for name in self.odl.get().split(';') if name.strip()]
 
-        if filename:
-            self.odl.set(filename)
-            self.parent.odl.process_odl(filename, '', self.parent, search=False)
-    
-            if self.parent.odl.code_file:
-                # Populate and sort the code file list
-                self.code_file_list = sorted(self.parent.odl.code_file, key=str.lower)
-                self.function_dict = self.parent.odl.function
-                self.flags_dict = self.parent.odl.flags
+        filenames = list(find_logs(filenames))
+        if filenames:
+            self._clear_code_file_entries()
+            self.load_odl(filenames)
+        else:
+            self._clear_code_file_entries()
 
-                # Set entries to read-only
+    def load_odl(self, filenames):
+        """Process the ODLs in a worker thread, polling it for progress."""
+        self.parent.odl.cancel.clear()
+        if self.parent.odl.profile is not None:
+            self.parent.odl.profile.close()
+        if self.parent.profiling.get():
+            self.parent.odl.profile = Profile(self.parent.trace_memory.get())
+        else:
+            self.parent.odl.profile = None
+        self.odl_file_entry.config(state='disabled')
+        self.odl_button.config(state='disabled')
+        self.find_button.config(state='disabled')
+        self.counts_button.config(state='disabled')
+        self.parent.output_frame.update_data_text('')
+        # Cached views point into the logs about to be closed
+        self.parent.data_frame.views.clear()
+        self.run_in_background(self.parent.odl.process_odls, (filenames,), self.odl_loaded)
+
+    def run_in_background(self, target, args, done):
+        """Run target in a worker thread, polling it for progress, and call
+        done back on the Tk thread once it has finished."""
+        self.parent.odl.cancel.clear()
+        self.show_progress()
+        self.load_done = done
+        self.load_thread = threading.Thread(target=target, args=args, daemon=True)
+        self.load_thread.start()
+        self.after(100, self.poll_odl)
+
+    def run_job(self, target, args, done):
+        """Run a job over the loaded logs in the background with the
+        controls that would start another one disabled, and put them back
+        as they were, locked by a search or not, before calling done."""
+        controls = (self.odl_file_entry, self.odl_button, self.find_button, self.search_button)
+        states = [str(control.cget('state')) for control in controls]
+        for control in controls:
+            control.config(state='disabled')
+        self.parent.output_frame.update_data_text('')
+
+        def job_done():
+            for control, state in zip(controls, states):
+                control.config(state=state)
+            done()
+
+        self.run_in_background(target, args, job_done)
+
+    def poll_odl(self):
+        if self.load_thread is None:
+            return
+        done, total = self.parent.odl.progress
+        self.progress_label.config(text=f'{self.parent.odl.stage}:')
+        self.progress_bar.config(maximum=total or 1, value=done)
+        if self.load_thread.is_alive():
+            self.after(100, self.poll_odl)
+            return
+
+        self.load_thread = None
+        self.hide_progress()
+        self.load_done()
+
+    def odl_loaded(self):
+        self.odl_file_entry.config(state='active')
+        self.odl_button.config(state='active')
+        self.parent.output_frame.update_data_text(self.parent.odl.error)
+        span = self.parent.odl.time_span()
+        self.span_label.config(text=f'Logged {format_time(span[0])} to {format_time(span[1])} UTC' if span else '')
+        with self.parent.odl.measure('Populating'):
+            self.populate_code_files()
+        if self.parent.odl.odls:
+            self.find_button.config(state='active')
+            self.counts_button.config(state='active')
+
+    def find_patterns(self):
+        """Search the params of every record of the loaded logs for the
+        pattern in Find, read as the kind next to it."""
+        if self.load_thread is not None or not self.parent.odl.odls:
+            return
+        try:
+            patterns = pattern_sources(self.pattern_kindv.get(), self.patternv.get())
+            compile_patterns(patterns)
+        except ValueError as e:
+            self.pattern_frame.config(bd=2, bg="red")
+            self.parent.output_frame.update_data_text(f'{e}')
+            return
+        self.pattern_frame.config(bd=0, bg=ttk.Style().lookup('TFrame', 'background'))
+        self.run_job(self.parent.odl.find_patterns, (patterns,), self.patterns_found)
+
+    def decode_logs(self):
+        """Decode every record of the loaded logs with a directory of
+        .cstruct files and report what did not decode in the Output pane."""
+        if self.load_thread is not None or not self.parent.odl.odls:
+            return
+        directory = filedialog.askdirectory(title="cstruct library")
+        if not directory:
+            return
+        self.library = StructLibrary()
+        self.library_dir = directory
+        self.run_job(self.parent.odl.decode_dir, (self.library, directory), self.logs_decoded)
+
+    def logs_decoded(self):
+        if not self.library.structs:
+            self.parent.output_frame.update_data_text('\n'.join(self.library.errors + [f'No structs in {self.library_dir}']))
+            return
+        lines = [self.parent.odl.error] if self.parent.odl.error else []
+        lines += self.library.errors
+        lines.append(f'{len(self.library.structs)} functions in the library\n')
+        lines.append(self.parent.odl.report.format())
+        self.parent.output_frame.update_data_text('\n'.join(lines))
+
+    def export_records(self):
+        """Stream every record of the loaded logs to a JSON Lines, CSV or
+        Parquet file, decoded with the cstruct library last decoded with."""
+        if self.load_thread is not None or not self.parent.odl.odls:
+            return
+        filename = filedialog.asksaveasfilename(title="Export records",
+                                                defaultextension=".jsonl",
+                                                filetypes=(("JSON Lines", "*.jsonl"),
+                                                           ("CSV file", "*.csv"),
+                                                           ("Parquet file", "*.parquet")))
+        if not filename:
+            return
+        try:
+            exporter = RecordExporter(filename, decoded=self.library is not None)
+        except (ImportError, OSError) as e:
+            self.parent.output_frame.update_data_text(f'{e}')
+            return
+        self.exporter = exporter
+        self.run_job(self.parent.odl.export_records, (exporter, self.library), self.records_exported)
+
+    def records_exported(self):
+        lines = [self.parent.odl.error] if self.parent.odl.error else []
+        lines.append(f'{self.exporter.count} records exported to {self.exporter.filename}')
+        self.exporter = None
+        self.parent.output_frame.update_data_text('\n'.join(lines))
+
+    def patterns_found(self):
+        matches = self.parent.odl.matches
+        lines = [self.parent.odl.error] if self.parent.odl.error else []
+        if matches:
+            lines.append(f'{"Hits":>8}  {"Pattern":<24}  Code_File / Function / Flags')
+            for label, code_file, function, flags, hits in matches:
+                lines.append(f'{hits:>8}  {label[:24]:<24}  {code_file} / {function} / {flags}')
+        else:
+            lines.append(f'No params contain {self.patternv.get().strip()!r}')
+        self.parent.output_frame.update_data_text('\n'.join(lines))
+
+    def cancel_odl(self, wait=False):
+        if self.load_thread is None:
+            return
+        self.parent.odl.cancel.set()
+        if wait:
+            self.load_thread.join()
+            self.load_thread = None
+            self.hide_progress()
+
+    def show_progress(self):
+        self.progress_label.config(text='')
+        self.progress_bar.config(value=0)
+        self.progress_label.grid()
+        self.progress_bar.grid()
+        self.cancel_button.grid()
+
+    def hide_progress(self):
+        self.progress_label.grid_remove()
+        self.progress_bar.grid_remove()
+        self.cancel_button.grid_remove()
+
+    def time_window(self):
+        """Return the (start, end) timestamps typed in From and To, None for
+        a bound left empty. A bound that does not parse is outlined in red
+        and left open."""
+        window = []
+        for value, frame in ((self.startv, self.start_frame), (self.endv, self.end_frame)):
+            try:
+                bound = parse_time(value.get()) if value.get().strip() else None
+            except ValueError:
+                bound = None
+                frame.config(bd=2, bg="red")
+            else:
+                frame.config(bd=0, bg=ttk.Style().lookup('TFrame', 'background'))
+            window.append(bound)
+        return tuple(window)
+
+    def apply_time_window(self, event=None):
+        if self.load_thread is None and self.parent.odl.code_file:
+            self.populate_code_files()
+
+    def populate_code_files(self):
+        # Only what was logged within the time window, if there is one
+        code_file, function, flags = self.parent.odl.catalog(*self.time_window())
+        # Once a function has a tab the code file stays locked, as the
+        # cstruct file is written for a single code file
+        locked = bool(self.parent.function_list)
+        if code_file:
+            # Populate and sort the code file list
+            self.code_file_list = sorted(code_file, key=str.lower)
+            self.function_dict = function
+            self.flags_dict = flags
+
+            # Set entries to read-only
+            if not locked:
                 self.code_file_entry.config(state='readonly')
-                self.function_entry.config(state='readonly')
-                self.flags_entry.config(state='readonly')
-        
-                # Enable the search button
-                self.search_button.config(state='active')
+            self.function_entry.config(state='readonly')
+            self.flags_entry.config(state='readonly')
 
-                # Update code file entry values
-                self.code_file_entry['values'] = self.code_file_list
-                self.code_file_entry.set('')  # Reset selection
+            # Enable the search button
+            self.search_button.config(state='active')
+
+            # Update code file entry values
+            self.code_file_entry['values'] = self.code_file_list
+            if locked:
+                self.update_function_options()
             else:
-                self._clear_code_file_entries()
+                self.code_file_entry.set('')  # Reset selection
+        elif locked:
+            self.code_file_list.clear()
+            self.code_file_entry['values'] = []
+            self.function_entry['values'] = []
+            self.function_entry.set('')
+            self.flags_entry.set('')
+            self.function_entry.config(state='disabled')
+            self.flags_entry.config(state='disabled')
+            self.search_button.config(state='disabled')
         else:
             self._clear_code_file_entries()
 
+    def select_function(self, code_file, function, flags):
+        """Select a function of the catalog in the comboboxes, as if picked
+        from them."""
+        if code_file not in self.function_dict or self.code_file_entry.cget('state') == 'disabled':
+            return
+        self.code_file_entry.set(code_file)
+        self.update_function_options()
+        self.function_entry.set(function)
+        self.update_flag_options()
+        self.flags_entry.set(flags)
+
     def _clear_code_file_entries(self):
         """Helper function to clear code file-related entries."""
         self.code_file_entry.config(state='disabled')
@@ -531,6 +1029,15 @@ class SearchFrame(ttk.Frame):
         self.cfv.set('')
         self.funcv.set('')
         self.flagsv.set('')
+        self.startv.set('')
+        self.endv.set('')
+        self.patternv.set('')
+        self.span_label.config(text='')
+        self.find_button.config(state='disabled')
+        self.counts_button.config(state='disabled')
+        self.pattern_frame.config(bd=0, bg=ttk.Style().lookup('TFrame', 'background'))
+        self.start_frame.config(bd=0, bg=ttk.Style().lookup('TFrame', 'background'))
+        self.end_frame.config(bd=0, bg=ttk.Style().lookup('TFrame', 'background'))
         self.odl_file_entry.config(state='active')
         self.odl_button.config(state='active')
         self.code_file_entry.config(state='disabled')
@@ -544,6 +1051,16 @@ class SearchFrame(ttk.Frame):
 
 
 class DataFrame:
+    # Printable ASCII is shown as is, any other byte as '.'
+    ascii_table = bytes(byte if 32 <= byte < 127 else ord('.') for byte in range(256))
+    bytes_per_line = 16
+    # Only the visible rows of the dump and this many rows either side of
+    # them are in the text widget at any time
+    margin = 200
+    # Payloads whose rendered rows and scroll position are kept, so going
+    # back to a tab does not format its dump again
+    cached_views = 32
+
     def __init__(self, master):
         self.master = master
         self.data_frame = ttk.Frame(master)
@@ -553,38 +1070,124 @@ class DataFrame:
                                  padx=5,
                                  pady=5,
                                  state='disabled')
+        self.linespace = font.Font(font=self.data_text.cget('font')).metrics('linespace')
+        self.data = ''
+        self.line_count = 0
+        self.top = 0  # first visible row of the dump
+        self.rendered = (0, 0)  # rows of the dump in the text widget
+        self.window = ''  # text of those rows
+        # id(data) -> (data, top, rendered, window)
+        self.views = collections.OrderedDict()
+
+        # Pages through every occurrence of the function in the current tab
+        self.sample_frame = ttk.Frame(self.data_frame, takefocus=False)
+        self.prev_button = ttk.Button(self.sample_frame, text="<", width=3,
+                                      takefocus=False, state='disabled')
+        self.sample_label = ttk.Label(self.sample_frame, anchor='center', width=24)
+        self.next_button = ttk.Button(self.sample_frame, text=">", width=3,
+                                      takefocus=False, state='disabled')
 
         self.setup_scrollbar()
         self.setup_layout()
 
     def setup_scrollbar(self):
+        # The scrollbar tracks the position in the whole dump, not in the
+        # rows that happen to be in the text widget
         self.scrollb = ttk.Scrollbar(self.data_frame,
-                                     command=self.data_text.yview)
-        self.data_text.configure(yscrollcommand=self.scrollb.set)
+                                     command=self.yview)
+        self.data_text.bind('<MouseWheel>', self.on_mousewheel)
+        self.data_text.bind('<Configure>', lambda e: self.render())
 
     def setup_layout(self):
         self.data_text.grid(row=0, column=0, sticky="nsew")
         self.scrollb.grid(row=0, column=1, sticky="ns")
+        self.sample_frame.grid(row=1, column=0, columnspan=2, pady=(5, 0))
+        self.prev_button.grid(row=0, column=0)
+        self.sample_label.grid(row=0, column=1, padx=5)
+        self.next_button.grid(row=0, column=2)
         self.data_frame.rowconfigure(0, weight=1)
         self.data_frame.columnconfigure(0, weight=1)
 
+    def update_sample_label(self, sample=0, count=0):
+        state = 'active' if count > 1 else 'disabled'
+        self.prev_button.config(state=state)
+        self.next_button.config(state=state)
+        self.sample_label.config(text=f"Sample {sample + 1} of {count}" if count else '')
+
     def update_data_text(self, data):
+        if self.data:
+            # Holding on to the payload also keeps its id from being reused
+            self.views[id(self.data)] = (self.data, self.top, self.rendered, self.window)
+            self.views.move_to_end(id(self.data))
+            if len(self.views) > self.cached_views:
+                self.views.popitem(last=False)
+        self.data = data
+        self.line_count = -(-len(data) // self.bytes_per_line)
+        view = self.views.get(id(data))
+        if view is not None and view[0] is data:
+            _, self.top, self.rendered, self.window = view
+            self.insert_window()
+            self.render()
+        else:
+            self.top = 0
+            self.render(force=True)
+
+    def insert_window(self):
         self.data_text.config(state='normal')
         self.data_text.delete(1.0, tk.END)  # Clear the existing content
-        formatted_data = self.format_bytes(data)
-        self.data_text.insert(tk.END, formatted_data)  # Insert new data
+        self.data_text.insert(tk.END, self.window)
         self.data_text.config(state='disabled')
 
-    @staticmethod
-    def format_bytes(data, bytes_per_line=16):
-        hex_str = ''.join(f'{byte:02X} ' for byte in data)
-        ascii_str = ''.join(chr(byte) if 32 <= byte < 127 else '.' for byte in data)
-        lines = []
-        for i in range(0, len(data), bytes_per_line):
-            hex_slice = hex_str[i*3:(i+bytes_per_line)*3].ljust(48)
-            ascii_slice = ascii_str[i:i+bytes_per_line]
-            lines.append(hex_slice + ' ' + ascii_slice)
-        return '\n'.join(lines)
+    def visible_rows(self):
+        height = self.data_text.winfo_height() - 2 * int(self.data_text.cget('pady'))
+        if height <= self.linespace:
+            # Not mapped yet
+            return int(self.data_text.cget('height'))
+        return height // self.linespace
+
+    def render(self, force=False):
+        rows = self.visible_rows()
+        self.top = max(0, min(self.top, self.line_count - rows))
+        start, stop = self.rendered
+        if force or self.top < start or min(self.top + rows, self.line_count) > stop:
+            start = max(0, self.top - self.margin)
+            stop = min(self.line_count, self.top + rows + self.margin)
+            self.window = '\n'.join(self.format_lines(self.data, start, stop))
+            self.insert_window()
+            self.rendered = (start, stop)
+        self.data_text.yview(f'{self.top - start + 1}.0')
+        if self.line_count:
+            self.scrollb.set(self.top / self.line_count,
+                             min(1.0, (self.top + rows) / self.line_count))
+        else:
+            self.scrollb.set(0.0, 1.0)
+
+    def yview(self, *args):
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * self.line_count)
+        elif args[0] == 'scroll':
+            step = self.visible_rows() if args[2] == 'pages' else 1
+            self.top += int(args[1]) * step
+        self.render()
+
+    def on_mousewheel(self, event):
+        self.top -= 3 * int(event.delta / 120)
+        self.render()
+        return "break"
+
+    @classmethod
+    def format_lines(cls, data, first=0, last=None, bytes_per_line=16):
+        """Format lines first up to last of the dump of data, each line
+        being the hex and ASCII columns of bytes_per_line bytes."""
+        if not data:
+            return []
+        end = None if last is None else last * bytes_per_line
+        chunk = bytes(data[first * bytes_per_line:end])
+        hex_str = chunk.hex(' ').upper()
+        ascii_str = chunk.translate(cls.ascii_table).decode('ascii')
+        width = bytes_per_line * 3
+        return [hex_str[i*3:i*3 + width - 1].ljust(width) + ' ' + ascii_str[i:i+bytes_per_line]
+                for i in range(0, len(chunk), bytes_per_line)]
 
 
 class InformationFrame:
@@ -730,9 +1333,12 @@ class NotebookManager(ttk.Notebook):
             self.event_generate("<<NotebookTabClosed>>")
             self.update_tab_names()
             self.parent.data_frame.update_data_text('')
+            self.parent.data_frame.update_sample_label()
             self.parent.output_frame.update_data_text('')
             self.parent.data_dict = self.parent.adjust_dict_keys(self.parent.data_dict, index)
             self.parent.output_dict = self.parent.adjust_dict_keys(self.parent.output_dict, index)
+            self.parent.occurrences_dict = self.parent.adjust_dict_keys(self.parent.occurrences_dict, index)
+            self.parent.sample_dict = self.parent.adjust_dict_keys(self.parent.sample_dict, index)
 
         self.state(["!pressed"])
         self._active = None
@@ -796,9 +1402,10 @@ class NotebookManager(ttk.Notebook):
         self.add(new_tab, text=f"Func {self.index('end')}  ")
         return new_tab, self.index('end')
 
-    def add_function_and_structure_frames(self, tab_frame,
+    def add_function_and_structure_frames(self, tab_frame, cfv_value,
                                           funcv_value, flagsv_value):
         function_frame = FunctionFrame(tab_frame, text="Functions:", takefocus=False, padding=5)
+        function_frame.code_file = cfv_value
         function_frame.funcv.set(funcv_value)
         function_frame.flagsv.set(flagsv_value)
         function_frame.grid(row=0, column=0, sticky="nsew")
@@ -816,6 +1423,8 @@ class FunctionFrame(ttk.LabelFrame):
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs)
         self.master = master
+        # Code file the function was searched in, keying it in function_list
+        self.code_file = ''
         self.funcv = tk.StringVar()
         self.dv = tk.StringVar()
         self.flagsv = tk.StringVar()
@@ -861,13 +1470,19 @@ class StructureFrame(ttk.LabelFrame):
         self.master = master
         self.parent = parent
         self.rows = []
+        # Definition last tested in this tab and its parser
+        self.template = None
+        self.cparser = None
         self.structure_frame = ttk.LabelFrame(master, text="Structure:", takefocus=False)
         self.add_button = ttk.Button(self, image=self.parent.add_img, takefocus=False,
                                      command=self.create_entry)
         self.test_button = ttk.Button(self, image=self.parent.test_img, takefocus=False,
                                       command=lambda: self.run_test(self.parent.odl.params))
+        self.batch_button = ttk.Button(self, text="Test all", takefocus=False,
+                                       command=self.run_batch_test)
         self.add_button.grid(row=0, column=0, pady=(0, 5), sticky="e")  # Grid add_button at row 0, column 0, aligned to east
         self.test_button.grid(row=3, column=0, pady=5, sticky="s")  # Grid test_button at row 1, column 0, aligned to south
+        self.batch_button.grid(row=4, column=0, pady=(0, 5), sticky="s")  # Grid batch_button below test_button
 
         # Create a canvas for scrollable area
         self.canvas = tk.Canvas(self, highlightthickness=0, height=200, takefocus=False)
@@ -960,21 +1575,60 @@ class StructureFrame(ttk.LabelFrame):
         event.widget.tk_focusNext().focus()
         return "break"
 
-    def run_test(self, data):
+    def build_template(self):
         template = "struct test {\n"
         for row in self.rows:
             om_value = row[1].get()
             entry_value = row[2].get()
             template += f"\t{om_value} {entry_value};\n"
         template += "};"
-        self.cparser = cstruct.cstruct()
+        return template
+
+    def field_names(self):
+        # Drop array sizes, "name[4]" is field name
+        return [re.sub(r'\[.*', '', row[2].get()).strip() for row in self.rows]
+
+    def compile(self):
+        """Return a parser for the rows, only looking it up again when they
+        changed since the last test in this tab."""
+        template = self.build_template()
+        if template != self.template:
+            self.cparser = self.parent.struct_cache.get(template)
+            self.template = template
+        return self.cparser
+
+    def run_test(self, data):
+        from dissect import cstruct  # only for dumpstruct, kept off startup
         try:
-            self.cparser.load(template)
-            params = self.cparser.test(data)
-            test = cstruct.dumpstruct(params, output='string')
+            with self.parent.odl.measure('Testing'):
+                params = self.compile().test(data)
+                test = cstruct.dumpstruct(params, output='string')
         except Exception as e:
             test = str(e)
 
+        self.show_result(test)
+
+    def run_batch_test(self):
+        """Parse every occurrence of the function with the struct, compiled
+        once, and show statistics of the results."""
+        index = self.parent.notebook_manager.index(self.parent.notebook_manager.select())
+        occurrences = self.parent.occurrences_dict.get(index)
+        if not occurrences:
+            return
+        try:
+            with self.parent.odl.measure('Testing all'):
+                report = StructReport(self.compile().test, self.field_names())
+                for sample in occurrences:
+                    report.add(sample)
+                test = report.format()
+                if self.parent.odl.profile is not None:
+                    self.parent.odl.profile.count(samples=report.samples)
+        except Exception as e:
+            test = str(e)
+
+        self.show_result(test)
+
+    def show_result(self, test):
         self.parent.output_frame.update_data_text(test)
         self.parent.output_dict[self.parent.notebook_manager.index(self.parent.notebook_manager.select())] = test
 
@@ -1002,9 +1656,20 @@ class DocumentFrame:
 
 
 class OutputFrame:
+    # Runs of text inserted per idle callback, so long output is drawn
+    # without blocking the UI
+    chunk_size = 500
+    # Outputs whose parsed runs are kept for switching back to their tab
+    cached_runs = 32
+
     def __init__(self, master):
         self.master = master
         self.output_frame = ttk.Frame(master)
+        self.pending = collections.deque()
+        self.after_id = None
+        # output text -> its (text, tag) runs. The hash of a str is cached,
+        # so looking up the text a tab already showed is cheap.
+        self.runs = collections.OrderedDict()
 
         self.output_text = tk.Text(self.output_frame,
                                    undo=False,
@@ -1022,29 +1687,29 @@ class OutputFrame:
 
     def setup_tags(self):
         tags = {
-            b'\x1b[1;31m': {"foreground": "red"},
-            b'\x1b[1;32m': {"foreground": "green"},
-            b'\x1b[1;92m': {"foreground": "green", "font": ('Consolas', 12, 'bold')},
-            b'\x1b[1;33m': {"foreground": "yellow"},
-            b'\x1b[1;93m': {"foreground": "yellow", "font": ('Consolas', 12, 'bold')},
-            b'\x1b[1;34m': {"foreground": '#3B78FF'},
-            b'\x1b[1;35m': {"foreground": "purple"},
-            b'\x1b[1;36m': {"foreground": "cyan"},
-            b'\x1b[1;37m': {"foreground": "white"},
-            b'\x1b[1;41m\x1b[1;37m': {"background": '#C50F1F'},
-            b'\x1b[1;42m\x1b[1;37m': {"background": '#13A10E'},
-            b'\x1b[1;43m\x1b[1;37m': {"background": '#C19C00'},
-            b'\x1b[1;44m\x1b[1;37m': {"background": '#0037DA'},
-            b'\x1b[1;45m\x1b[1;37m': {"background": '#881798'},
-            b'\x1b[1;46m\x1b[1;37m': {"background": '#3A96DD'},
-            b'\x1b[1;47m\x1b[1;30m': {"background": '#CCCCCC', "foreground": '#767693'},
-            b'\x1b[1;0m\x1b[1;41m\x1b[1;37m': {"background": '#C50F1F'},
-            b'\x1b[1;0m\x1b[1;42m\x1b[1;37m': {"background": '#13A10E'},
-            b'\x1b[1;0m\x1b[1;43m\x1b[1;37m': {"background": '#C19C00'},
-            b'\x1b[1;0m\x1b[1;44m\x1b[1;37m': {"background": '#0037DA'},
-            b'\x1b[1;0m\x1b[1;45m\x1b[1;37m': {"background": '#881798'},
-            b'\x1b[1;0m\x1b[1;46m\x1b[1;37m': {"background": '#3A96DD'},
-            b'\x1b[1;0m\x1b[1;47m\x1b[1;30m': {"background": '#CCCCCC', "foreground": '#767693'}
+            '\x1b[1;31m': {"foreground": "red"},
+            '\x1b[1;32m': {"foreground": "green"},
+            '\x1b[1;92m': {"foreground": "green", "font": ('Consolas', 12, 'bold')},
+            '\x1b[1;33m': {"foreground": "yellow"},
+            '\x1b[1;93m': {"foreground": "yellow", "font": ('Consolas', 12, 'bold')},
+            '\x1b[1;34m': {"foreground": '#3B78FF'},
+            '\x1b[1;35m': {"foreground": "purple"},
+            '\x1b[1;36m': {"foreground": "cyan"},
+            '\x1b[1;37m': {"foreground": "white"},
+            '\x1b[1;41m\x1b[1;37m': {"background": '#C50F1F'},
+            '\x1b[1;42m\x1b[1;37m': {"background": '#13A10E'},
+            '\x1b[1;43m\x1b[1;37m': {"background": '#C19C00'},
+            '\x1b[1;44m\x1b[1;37m': {"background": '#0037DA'},
+            '\x1b[1;45m\x1b[1;37m': {"background": '#881798'},
+            '\x1b[1;46m\x1b[1;37m': {"background": '#3A96DD'},
+            '\x1b[1;47m\x1b[1;30m': {"background": '#CCCCCC', "foreground": '#767693'},
+            '\x1b[1;0m\x1b[1;41m\x1b[1;37m': {"background": '#C50F1F'},
+            '\x1b[1;0m\x1b[1;42m\x1b[1;37m': {"background": '#13A10E'},
+            '\x1b[1;0m\x1b[1;43m\x1b[1;37m': {"background": '#C19C00'},
+            '\x1b[1;0m\x1b[1;44m\x1b[1;37m': {"background": '#0037DA'},
+            '\x1b[1;0m\x1b[1;45m\x1b[1;37m': {"background": '#881798'},
+            '\x1b[1;0m\x1b[1;46m\x1b[1;37m': {"background": '#3A96DD'},
+            '\x1b[1;0m\x1b[1;47m\x1b[1;30m': {"background": '#CCCCCC', "foreground": '#767693'}
         }
 
         for tag, options in tags.items():
@@ -1062,169 +1727,53 @@ class OutputFrame:
         self.output_frame.columnconfigure(0, weight=1)
 
     def update_data_text(self, data):
+        self.pending.clear()
+        if self.after_id is not None:
+            self.output_text.after_cancel(self.after_id)
+            self.after_id = None
         self.output_text.config(state='normal')
         self.output_text.delete(1.0, tk.END)
-        ansi_escape = re.compile('((?:\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])){3}|(?:\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])){2}|(?:\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])))')
-        line = ansi_escape.split(data)
-        s = len(line)
-
-        if s % 2 != 0:
-            s = s - 1
-
-        self.output_text.insert(tk.END, line[0].lstrip())
-
-        for i in range(1, s, 2):
-            tag = line[i]
-            w = line[i+1]
-
-            self.output_text.insert(tk.END, w, tag)
-
         self.output_text.config(state='disabled')
+        runs = self.runs.get(data)
+        if runs is None:
+            runs = self.runs[data] = self.parse(data.lstrip())
+            if len(self.runs) > self.cached_runs:
+                self.runs.popitem(last=False)
+        else:
+            self.runs.move_to_end(data)
+        self.pending.extend(runs)
+        self.insert_pending()
 
-
-class ODL:
-    def __init__(self):
-        self.headers = '''
-        typedef struct _Odl_header{
-            char    signature[8];  // EBFGONED
-            uint32    odl_version;
-            uint32    unk1;
-            uint64    unk2;
-            uint32    unk3;
-            char      one_drive_version[0x40];
-            char      windows_version[0x40];
-            char      reserved[0x64];
-        } Odl_header;
-
-        typedef struct _Data_block_V2{
-            uint64     signature;  // CCDDEEFF00000000
-            uint64     timestamp;
-            uint32     unk1;
-            uint32     unk2;
-            uint128    unk3_guid;
-            uint32     unk4;
-            uint32     unk5;
-            uint32     data_len;
-            uint32     unk6;
-            // followed by Data
-        } Data_block_V2;
-
-        typedef struct _Data_block_V3{
-            uint64    signature;  // CCDDEEFF00000000
-            uint64    timestamp;
-            uint32    unk1;
-            uint32    unk2;
-            uint32    data_len;
-            uint32    unk3;
-            // followed by Data
-        } Data_block_V3;
-
-        typedef struct _Data_v2{
-            uint32    code_file_name_len;
-            char      code_file_name[code_file_name_len];
-            uint32    flags;
-            uint32    code_function_name_len;
-            char      code_function_name[code_function_name_len];
-        } Data_v2;
-
-        typedef struct _Data_v3{
-            uint128    unk1_guid;
-            uint32     unk2;
-            uint32     unk3;
-            uint32     code_file_name_len;
-            char       code_file_name[code_file_name_len];
-            uint32     flags;
-            uint32     code_function_name_len;
-            char       code_function_name[code_function_name_len];
-        } Data_v3;
-
-        '''
-        self.cparser = cstruct.cstruct()
-        self.cparser.load(self.headers)
-        self.code_file = []
-        self.function = {}
-        self.flags = {}
-        self.params = ''
-
-    def process_odl(self, filename, func_find, parent, search=True):
-        parent.output_frame.update_data_text('')
-        basename = os.path.basename(filename)
-        if not search:
-            self.code_file.clear()
-            self.function.clear()
-            self.flags.clear()
-        self.params = ''
-        try:
-            f = open(filename, 'rb')
-        except Exception as e:
-            parent.output_frame.update_data_text(f'{e}')
-            return
-        with f:
-            try:
-                header = self.cparser.Odl_header(f.read(0x100))
-            except Exception as e:
-                parent.output_frame.update_data_text(f'Unable to parse {basename}. Not a valid log file.')
-                return
-            if header.signature == b'EBFGONED':  # Odl header
-                pass
-            else:
-                parent.output_frame.update_data_text(f'Bad header signature')
-                return
-            signature = f.read(8)
-            if signature[0:4] == b'\x1F\x8B\x08\x00':  # gzip
-                try:
-                    f.seek(-8, 1)
-                    all_data = f.read()
-                    z = zlib.decompressobj(31)
-                    file_data = z.decompress(all_data)
-                except (zlib.error, OSError) as e:
-                    parent.output_frame.update_data_text(f'..decompression error for file {basename}. {e}')
-                    return
-                f.close()
-                f = io.BytesIO(file_data)
-                signature = f.read(8)
-            if signature != b'\xCC\xDD\xEE\xFF\0\0\0\0':  # CDEF header
-                parent.output_frame.update_data_text(f'{basename} wrong header! Did not find 0xCCDDEEFF')
-                return
-            else:
-                f.seek(-8, 1)
-                db_size = 32 if header.odl_version == 3 else 56
-                data_block = f.read(db_size)  # odl complete header is 56 bytes
-            while data_block:
-                if header.odl_version == 2:
-                    data_block = self.cparser.Data_block_V2(data_block)
-                elif header.odl_version == 3:
-                    data_block = self.cparser.Data_block_V3(data_block)
-                else:
-                    parent.output_frame.update_data_text(f'Unknown odl_version = {header.odl_version}')
-                    return
-                if data_block.signature != 0xffeeddcc:
-                    parent.output_frame.update_data_text(f'Unable to parse {basename} completely. Did not find 0xCCDDEEFF')
-                    break
-                try:
-                    if header.odl_version == 3:
-                        data = self.cparser.Data_v3(f.read(data_block.data_len))
-                        params_len = (data_block.data_len - data.code_file_name_len - data.code_function_name_len - 36)
-                    else:
-                        data = self.cparser.Data_v2(f.read(data_block.data_len))
-                        params_len = (data_block.data_len - data.code_file_name_len - data.code_function_name_len - 12)
-                    f.seek(- params_len, io.SEEK_CUR)
-                except Exception as e:
-                    parent.output_frame.update_data_text(f'Unable to parse {basename} completely. {type(e).__name__}')
-                    return
-
-                if not search and params_len:
-                    self.code_file.append(data.code_file_name.decode('utf8')) if data.code_file_name.decode('utf8') not in self.code_file else None
-                    self.function.setdefault(data.code_file_name.decode('utf8'), []).append(data.code_function_name.decode('utf8')) if data.code_function_name.decode('utf8') not in self.function.get(data.code_file_name.decode('utf8'), []) else None
-                    self.flags.setdefault(data.code_function_name.decode('utf8'), []).append(data.flags) if data.flags not in self.flags.get(data.code_function_name.decode('utf8'), []) else None
-
-                if params_len:
-                    if func_find == f"{data.code_file_name.decode('utf8').lower()}{data.code_function_name.decode('utf8').lower()}{data.flags}":
-                        self.params = f.read(params_len)
-                    else:
-                        f.read(params_len)
-
-                data_block = f.read(db_size)
+    @staticmethod
+    def parse(data):
+        """Split ANSI colored text into (text, tag) runs, neighbouring
+        text with the same tag merged."""
+        parts = ANSI_ESCAPE.split(data)
+        runs = []
+        tag = ()
+        text = parts[0]
+        for i in range(1, len(parts), 2):
+            if parts[i] != tag:
+                if text:
+                    runs.append((text, tag))
+                tag = parts[i]
+                text = ''
+            text += parts[i + 1]
+        if text:
+            runs.append((text, tag))
+        return runs
+
+    def insert_pending(self):
+        self.after_id = None
+        args = []
+        for _ in range(min(self.chunk_size, len(self.pending))):
+            args.extend(self.pending.popleft())
+        if args:
+            self.output_text.config(state='normal')
+            self.output_text.insert(tk.END, *args)
+            self.output_text.config(state='disabled')
+        if self.pending:
+            self.after_id = self.output_text.after_idle(self.insert_pending)
 
 
 class LabelSeparator(tk.Frame):
@@ -1264,13 +1813,19 @@ class ParentClass:
         self.data_dict = {}
         self.function_list = []
         self.output_dict = {}
-        self.odl = ODL()
+        self.occurrences_dict = {}
+        self.sample_dict = {}
+        self.struct_cache = StructCache()
+        self.odl = ODLGroup(cache_dir=os.path.abspath('lyman_cache'))
+        self.profiling = tk.BooleanVar(value=False)
+        self.trace_memory = tk.BooleanVar(value=False)
         self.add_images()
         self.setup_menu()
         self.setup_frames()
         self.pane_config()
 
     def get_monitor_from_position(self, x, y):
+        from screeninfo import get_monitors
         # Get the resolution of the primary monitor
         monitors = get_monitors()
         for monitor in monitors:
@@ -1356,18 +1911,25 @@ class ParentClass:
             '''),
         )
         
-        self.add_img = ImageTk.PhotoImage(Image.open(application_path + '/Lyman/plus_green.png'))
-        self.minus_img = ImageTk.PhotoImage(Image.open(application_path + '/Lyman/minus_red.png'))
-        self.test_img = ImageTk.PhotoImage(Image.open(application_path + '/Lyman/yes.png'))
-        self.save_img = ImageTk.PhotoImage(Image.open(application_path + '/Lyman/floppy_35inch_green.png'))
-        self.undo_img = ImageTk.PhotoImage(Image.open(application_path + '/Lyman/undo_yellow.png'))
-        self.exit_img = ImageTk.PhotoImage(Image.open(application_path + '/Lyman/no.png'))
-        self.skin_img = ImageTk.PhotoImage(Image.open(application_path + '/Lyman/skin.png'))
-        self.search_img = ImageTk.PhotoImage(Image.open(application_path + '/Lyman/magnifier.png'))
-        self.lyman_img = ImageTk.PhotoImage(Image.open(application_path + '/Lyman/lyman.png'))
-        self.question_small_img = ImageTk.PhotoImage(Image.open(application_path + '/Lyman/question_small.png'))
-        self.help_img = ImageTk.PhotoImage(Image.open(application_path + '/Lyman/help.png'))
-        self.lyman_small_img = ImageTk.PhotoImage(Image.open(application_path + '/Lyman/lyman_small.png'))
+        # Tk 8.6 decodes PNG itself, no need to go through PIL
+        self.add_img = tk.PhotoImage(file=application_path + '/Lyman/plus_green.png')
+        self.minus_img = tk.PhotoImage(file=application_path + '/Lyman/minus_red.png')
+        self.test_img = tk.PhotoImage(file=application_path + '/Lyman/yes.png')
+        self.save_img = tk.PhotoImage(file=application_path + '/Lyman/floppy_35inch_green.png')
+        self.undo_img = tk.PhotoImage(file=application_path + '/Lyman/undo_yellow.png')
+        self.exit_img = tk.PhotoImage(file=application_path + '/Lyman/no.png')
+        self.skin_img = tk.PhotoImage(file=application_path + '/Lyman/skin.png')
+        self.search_img = tk.PhotoImage(file=application_path + '/Lyman/magnifier.png')
+        self.question_small_img = tk.PhotoImage(file=application_path + '/Lyman/question_small.png')
+        self.help_img = tk.PhotoImage(file=application_path + '/Lyman/help.png')
+        self.lyman_small_img = tk.PhotoImage(file=application_path + '/Lyman/lyman_small.png')
+        # The large logo is only shown in About, see lyman_image
+        self.lyman_img = None
+
+    def lyman_image(self):
+        if self.lyman_img is None:
+            self.lyman_img = tk.PhotoImage(file=application_path + '/Lyman/lyman.png')
+        return self.lyman_img
 
     def setup_menu(self):
         html_file = self.application_path + '/lyman/manual/manual.html'
@@ -1391,7 +1953,15 @@ class ParentClass:
                                                                   submenu.entryconfig(submenu.index(ttk.Style().theme_use()), background='grey'), self.pane_config()])
 
         options_menu.add_cascade(label="Skins", image=self.skin_img, compound='left', menu=submenu)
+        options_menu.add_separator()
+        options_menu.add_checkbutton(label="Profile loading", variable=self.profiling)
+        options_menu.add_checkbutton(label="Trace allocations (slow)", variable=self.trace_memory)
+        options_menu.add_command(label="Loading profile", command=lambda: ProfileDialog(self.root, self))
         file_menu.add_command(label="Export cstruct", image=self.save_img, compound='left', command=self.export_cstruct)
+        file_menu.add_command(label="Decode with cstruct library",
+                              command=lambda: self.search_frame.decode_logs())
+        file_menu.add_command(label="Export records",
+                              command=lambda: self.search_frame.export_records())
         file_menu.add_command(label="Clear", image=self.undo_img, compound='left',command=self.reset_variables)
         file_menu.add_command(label="Exit", image=self.exit_img, compound='left', command=lambda: QuitDialog(self.root))
         help_menu.add_command(label="Quick help", image=self.question_small_img, compound='left', command=lambda: Help(self.root))
@@ -1427,13 +1997,15 @@ class ParentClass:
 
     def bind_events(self):
         self.search_frame.search_button.bind("<Button-1>")
+        self.data_frame.prev_button.config(command=lambda: self.show_sample(-1))
+        self.data_frame.next_button.config(command=lambda: self.show_sample(1))
 
-    def create_tab(self, funcv_value, flagsv_value):
+    def create_tab(self, cfv_value, funcv_value, flagsv_value):
         # Create a new tab
         new_tab, tab_index = self.notebook_manager.create_tab()
         if len(self.notebook_manager.tabs()) - 1 == 0:
             self.notebook_manager.grid(row=2, column=0, rowspan=2, sticky="nsew")
-        self.notebook_manager.add_function_and_structure_frames(new_tab, funcv_value, flagsv_value)
+        self.notebook_manager.add_function_and_structure_frames(new_tab, cfv_value, funcv_value, flagsv_value)
         self.notebook_manager.select(tab_index - 1)
         return tab_index - 1
 
@@ -1441,14 +2013,22 @@ class ParentClass:
         self.info_frame.description_entry.config(stat='normal')
         self.info_frame.author_entry.config(stat='normal')
         self.info_frame.version_entry.config(stat='normal')
-        if (f'{funcv_value}{flagsv_value}') not in self.function_list:
-            self.function_list.append(f'{funcv_value}{flagsv_value}')
-            func_find = f"{cfv_value.lower()}{funcv_value.lower()}{flagsv_value}"
-            self.odl.process_odl(odl_value, func_find, self)
+        # Only functions that got a tab are listed, so one whose time
+        # window came up empty can still be searched again
+        if (cfv_value, funcv_value, flagsv_value) not in self.function_list:
+            with self.odl.measure('Searching'):
+                occurrences = self.odl.occurrences(cfv_value, funcv_value, flagsv_value,
+                                                   *self.search_frame.time_window())
+                self.odl.params = occurrences[-1] if occurrences else ''
             if self.odl.params:
-                tab_index = self.create_tab(funcv_value, flagsv_value)
-                self.data_dict.setdefault(tab_index, self.odl.params)
-                self.data_frame.update_data_text(self.odl.params)
+                with self.odl.measure('Rendering'):
+                    tab_index = self.create_tab(cfv_value, funcv_value, flagsv_value)
+                    self.function_list.append((cfv_value, funcv_value, flagsv_value))
+                    self.data_dict.setdefault(tab_index, self.odl.params)
+                    self.occurrences_dict[tab_index] = occurrences
+                    self.sample_dict[tab_index] = len(occurrences) - 1
+                    self.data_frame.update_data_text(self.odl.params)
+                    self.data_frame.update_sample_label(len(occurrences) - 1, len(occurrences))
                 self.info_frame.iv.set(uuid.uuid4())
                 self.info_frame.cv.set(cfv_value)
 
@@ -1469,6 +2049,23 @@ class ParentClass:
             self.odl.params = self.data_dict[selected_tab_index]
         except KeyError:
             self.odl.params = ''
+        try:
+            self.data_frame.update_sample_label(self.sample_dict[selected_tab_index],
+                                                len(self.occurrences_dict[selected_tab_index]))
+        except KeyError:
+            self.data_frame.update_sample_label()
+
+    def show_sample(self, step):
+        try:
+            index = self.notebook_manager.index(self.notebook_manager.select())
+            occurrences = self.occurrences_dict[index]
+        except (tk.TclError, KeyError):
+            return
+        sample = (self.sample_dict[index] + step) % len(occurrences)
+        self.sample_dict[index] = sample
+        self.odl.params = self.data_dict[index] = occurrences[sample]
+        self.data_frame.update_data_text(self.odl.params)
+        self.data_frame.update_sample_label(sample, len(occurrences))
 
     def adjust_dict_keys(self, my_dict, key_to_remove):
         if key_to_remove in my_dict:
@@ -1487,7 +2084,7 @@ class ParentClass:
         
         for child in tab.winfo_children():
                 if isinstance(child, FunctionFrame):
-                    self.function_list.remove(f'{child.funcv.get()}{child.flagsv.get()}')
+                    self.function_list.remove((child.code_file, child.funcv.get(), child.flagsv.get()))
 
     def pane_config(self):
         bg = ttk.Style().lookup('TFrame', 'background')
@@ -1517,6 +2114,9 @@ class ParentClass:
         self.search_frame.code_frame.config(bg=bg) if self.search_frame.code_frame.cget("bg") != "red" else None
         self.search_frame.function_frame.config(bg=bg) if self.search_frame.function_frame.cget("bg") != "red" else None
         self.search_frame.flags_frame.config(bg=bg) if self.search_frame.flags_frame.cget("bg") != "red" else None
+        self.search_frame.start_frame.config(bg=bg) if self.search_frame.start_frame.cget("bg") != "red" else None
+        self.search_frame.end_frame.config(bg=bg) if self.search_frame.end_frame.cget("bg") != "red" else None
+        self.search_frame.pattern_frame.config(bg=bg) if self.search_frame.pattern_frame.cget("bg") != "red" else None
         self.info_frame.description_frame.config(bg=bg) if self.info_frame.description_frame.cget("bg") != "red" else None
         self.info_frame.author_frame.config(bg=bg) if self.info_frame.author_frame.cget("bg") != "red" else None
         self.info_frame.version_frame.config(bg=bg) if self.info_frame.version_frame.cget("bg") != "red" else None
@@ -1584,6 +2184,8 @@ class ParentClass:
         self.data_dict = {}
         self.function_list = []
         self.output_dict = {}
+        self.occurrences_dict = {}
+        self.sample_dict = {}
 
         # notebook reset
         self.notebook_manager.destroy()
@@ -1591,8 +2193,15 @@ class ParentClass:
         self.notebook_manager = NotebookManager(self.main_frame, self, takefocus=False)
         self.notebook_manager.bind("<<NotebookTabChanged>>", self.on_tab_change)
 
-        # data reset
+        # data reset, dropping the cached views before the log they point
+        # into is closed
         self.data_frame.update_data_text('')
+        self.data_frame.views.clear()
+        self.data_frame.update_sample_label()
+
+        # odl reset
+        self.search_frame.cancel_odl(wait=True)
+        self.odl.close()
 
         # search reset
         self.search_frame.code_file_entry.config(state="readonly")
@@ -1611,8 +2220,9 @@ class ParentClass:
     def run(self):
         self.root.mainloop()
 
-if getattr(sys, 'frozen', False):
-    pyi_splash.close()
+if __name__ == '__main__':
+    if getattr(sys, 'frozen', False):
+        pyi_splash.close()
 
-parent_instance = ParentClass()
-parent_instance.run()
+    parent_instance = ParentClass()
+    parent_instance.run()
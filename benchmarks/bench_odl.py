@@ -0,0 +1,224 @@
+"""Parsing throughput benchmarks for odl.py on synthetic logs.
+
+Generates v2 and v3 logs, plain and gzipped, laid out like the Odl_header,
+Data_block_V2/V3 and Data_v2/v3 definitions in odl.ODL, and times:
+
+    scan     process_odl, walking every record into the catalog and index
+    cached   process_odl again, reading the catalog and index from the cache
+    catalog  building the sorted code file, function and flags lists the
+             Search pane offers from a scanned catalog
+    lookup   finding a function's params slices and reading them all
+
+Every case runs in a fresh process so its peak RSS is its own.
+
+    python benchmarks/bench_odl.py --records 100000 1000000 --json results.json
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from odl import ODL  # noqa: E402
+
+odl_header = struct.Struct('<8sIIQI64s64s100s')
+data_block_v2 = struct.Struct('<QQII16sIIII')
+data_block_v3 = struct.Struct('<QQIIII')
+name_len = struct.Struct('<I')
+flags_name_len = struct.Struct('<II')
+
+
+def generate(path, version=2, records=100000, code_files=50, functions=2000,
+             params_size=64, gzipped=False, seed=0):
+    """Write a synthetic log of records spread evenly over functions, which
+    are spread over code_files, with random params of 0 to 2 * params_size
+    bytes. Returns the size of the file."""
+    rng = random.Random(seed)
+    names = [(b'Synthetic%d.cpp' % (i % code_files), b'Function%d' % i)
+             for i in range(functions)]
+    # Everything but the params and timestamp of a record, per function
+    prefixes = []
+    for code_file_name, code_function_name in names:
+        data = (name_len.pack(len(code_file_name)) + code_file_name
+                + flags_name_len.pack(rng.randrange(4), len(code_function_name))
+                + code_function_name)
+        if version == 3:
+            data = rng.randbytes(16) + bytes(8) + data
+        prefixes.append(data)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzipped else None
+    with open(path, 'wb') as f:
+        f.write(odl_header.pack(b'EBFGONED', version, 0, 0, 0, b'24.1.0.0', b'10.0.19045', b''))
+        chunk = bytearray()
+        timestamp = 1700000000000
+        for _ in range(records):
+            data = rng.choice(prefixes) + rng.randbytes(rng.randrange(2 * params_size + 1))
+            timestamp += rng.randrange(50)
+            if version == 3:
+                chunk += data_block_v3.pack(0xffeeddcc, timestamp, 0, 0, len(data), 0)
+            else:
+                chunk += data_block_v2.pack(0xffeeddcc, timestamp, 0, 0, bytes(16), 0, 0, len(data), 0)
+            chunk += data
+            if len(chunk) >= 0x100000:
+                f.write(compressor.compress(chunk) if gzipped else chunk)
+                chunk.clear()
+        f.write(compressor.compress(chunk) + compressor.flush() if gzipped else chunk)
+        return f.tell()
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes."""
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD),
+                        ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t),
+                        ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t),
+                        ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                 ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def best_of(repeat, function):
+    """Return the shortest of repeat timed calls of function and its last
+    result."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_case(path, records, repeat, lookups):
+    """Benchmark one log of records records. Runs in its own process."""
+    baseline = peak_rss()
+    odl = ODL()
+
+    def scan():
+        odl.process_odl(path)
+        if odl.error:
+            raise RuntimeError(odl.error)
+        return sum(len(slices) // 2 for slices in odl.index.values())
+
+    scan_time, indexed = best_of(repeat, scan)
+    walked = len(odl.view)
+    scan_rss = peak_rss()
+
+    def catalog():
+        code_files = sorted(odl.code_file, key=str.lower)
+        functions = {code_file: sorted(odl.function[code_file], key=str.lower)
+                     for code_file in code_files}
+        flags = {function: sorted(odl.flags[function]) for function in odl.flags}
+        return code_files, functions, flags
+
+    catalog_time, _ = best_of(repeat, catalog)
+
+    rng = random.Random(0)
+    keys = rng.choices(list(odl.index), k=lookups)
+
+    def lookup():
+        total = 0
+        for code_file, function, flags in keys:
+            for offset, params in odl.iter_params(code_file, function, flags):
+                total += len(params)
+        return total
+
+    lookup_time, _ = best_of(repeat, lookup)
+    odl.close()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        odl.cache_dir = cache_dir
+        scan()
+        cached_time, _ = best_of(repeat, scan)
+        odl.close()
+
+    # Records without params are walked but not indexed
+    return {'records': records,
+            'indexed': indexed,
+            'file_bytes': os.path.getsize(path),
+            'walked_bytes': walked,
+            'scan_s': scan_time,
+            'cached_s': cached_time,
+            'catalog_s': catalog_time,
+            'lookup_s': lookup_time / lookups,
+            'baseline_rss': baseline,
+            'scan_rss': scan_rss,
+            'peak_rss': peak_rss()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark odl.py on synthetic logs.')
+    parser.add_argument('--records', type=int, nargs='+', default=[100000],
+                        help='records per log (default 100000)')
+    parser.add_argument('--versions', type=int, nargs='+', choices=(2, 3), default=[2, 3])
+    parser.add_argument('--code-files', type=int, default=50,
+                        help='distinct code file names (default 50)')
+    parser.add_argument('--functions', type=int, default=2000,
+                        help='distinct function names (default 2000)')
+    parser.add_argument('--params-size', type=int, default=64,
+                        help='average params size in bytes (default 64)')
+    parser.add_argument('--plain-only', action='store_true', help='skip the gzipped logs')
+    parser.add_argument('--repeat', type=int, default=3, help='best of this many runs (default 3)')
+    parser.add_argument('--lookups', type=int, default=100,
+                        help='functions looked up per run (default 100)')
+    parser.add_argument('--dir', help='keep the generated logs in this directory')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = args.dir or temp_dir
+        os.makedirs(directory, exist_ok=True)
+        results = []
+        print(f'{"log":<32} {"records/s":>12} {"MB/s":>8} {"scan s":>8} {"cached s":>9} '
+              f'{"catalog ms":>11} {"lookup ms":>10} {"peak MB":>8}')
+        for records in args.records:
+            for version in args.versions:
+                for gzipped in (False,) if args.plain_only else (False, True):
+                    name = (f'v{version}_{records}_{args.code_files}x{args.functions}_{args.params_size}'
+                            f'{".odlgz" if gzipped else ".odl"}')
+                    path = os.path.join(directory, name)
+                    if not os.path.exists(path):
+                        generate(path, version, records, args.code_files, args.functions,
+                                 args.params_size, gzipped)
+                    # A fresh process per case keeps peak RSS per case
+                    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as pool:
+                        result = pool.submit(run_case, path, records, args.repeat, args.lookups).result()
+                    result.update(log=name, version=version, gzipped=gzipped,
+                                  code_files=args.code_files, functions=args.functions,
+                                  params_size=args.params_size)
+                    results.append(result)
+                    print(f'{name:<32} {result["records"] / result["scan_s"]:>12,.0f} '
+                          f'{result["walked_bytes"] / result["scan_s"] / 1e6:>8.1f} '
+                          f'{result["scan_s"]:>8.3f} {result["cached_s"]:>9.3f} '
+                          f'{result["catalog_s"] * 1e3:>11.2f} {result["lookup_s"] * 1e3:>10.3f} '
+                          f'{result["peak_rss"] / 1e6:>8.1f}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2287 @@
+import atexit
+import bisect
+import collections
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import weakref
+import zlib
+from array import array
+from itertools import islice
+
+LOG_EXTENSIONS = ('.odl', '.odlgz', '.odlsent', '.aodl')
+# Bump when the layout of the scans in the index cache changes
+CACHE_VERSION = 5
+# Index cache files start with CACHE_MAGIC and the length of a JSON header,
+# followed by the index, times and sizes arrays of each function in the
+# order of the header's keys. Unlike a pickle, reading one cannot run code
+# whoever else can write to the cache directory.
+CACHE_MAGIC = b'LYMANIDX'
+
+# One record of a log as yielded by ODL.records. offset is where its
+# Data_block starts in the mapped records, params a zero-copy view.
+Record = collections.namedtuple('Record', 'offset timestamp code_file function flags params')
+
+# A record decoded by StructLibrary.decode: the Record, the name of the
+# struct it matched and the decoded fields, or the error parsing them
+Decoded = collections.namedtuple('Decoded', 'record struct fields error')
+
+# Inflated spool files that could not be deleted yet, on Windows because
+# they were still mapped. Tried again on every close and at exit.
+stale_spools = set()
+
+
+def remove_spool(path):
+    """Delete an inflated spool file, or keep it in stale_spools to try
+    again later."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        stale_spools.add(path)
+        return
+    stale_spools.discard(path)
+
+
+@atexit.register
+def remove_stale_spools():
+    for path in list(stale_spools):
+        remove_spool(path)
+
+
+class ODL:
+    # Precompiled layouts of the fixed-size parts of the Data_block and Data
+    # structures below, yielding (signature, timestamp, data_len) and
+    # (flags, code_function_name_len). Only used while verify_fast_path
+    # agrees with what cstruct makes of the definitions.
+    data_block_v2 = struct.Struct('<QQ32xI4x')
+    data_block_v3 = struct.Struct('<QQ8xI4x')
+    name_len = struct.Struct('<I')
+    flags_name_len = struct.Struct('<II')
+    # Bytes walked between progress updates and cancel checks
+    update_interval = 0x100000
+    # Payload statistics kept per function in self.sizes, read through
+    # PayloadSizes: occurrences, smallest, largest and total params length,
+    # then a histogram of params lengths by bit length
+    empty_sizes = array('Q', [0, 2 ** 64 - 1, 0, 0] + [0] * 33)
+    # cstruct parser of the definitions below and whether the fast path
+    # agrees with it, shared by every instance and set up by the first, so
+    # importing this module does not pay for cstruct
+    cparser = None
+    fast_path = False
+
+    def __init__(self):
+        self.headers = '''
+        typedef struct _Odl_header{
+            char    signature[8];  // EBFGONED
+            uint32    odl_version;
+            uint32    unk1;
+            uint64    unk2;
+            uint32    unk3;
+            char      one_drive_version[0x40];
+            char      windows_version[0x40];
+            char      reserved[0x64];
+        } Odl_header;
+
+        typedef struct _Data_block_V2{
+            uint64     signature;  // CCDDEEFF00000000
+            uint64     timestamp;
+            uint32     unk1;
+            uint32     unk2;
+            uint128    unk3_guid;
+            uint32     unk4;
+            uint32     unk5;
+            uint32     data_len;
+            uint32     unk6;
+            // followed by Data
+        } Data_block_V2;
+
+        typedef struct _Data_block_V3{
+            uint64    signature;  // CCDDEEFF00000000
+            uint64    timestamp;
+            uint32    unk1;
+            uint32    unk2;
+            uint32    data_len;
+            uint32    unk3;
+            // followed by Data
+        } Data_block_V3;
+
+        typedef struct _Data_v2{
+            uint32    code_file_name_len;
+            char      code_file_name[code_file_name_len];
+            uint32    flags;
+            uint32    code_function_name_len;
+            char      code_function_name[code_function_name_len];
+        } Data_v2;
+
+        typedef struct _Data_v3{
+            uint128    unk1_guid;
+            uint32     unk2;
+            uint32     unk3;
+            uint32     code_file_name_len;
+            char       code_file_name[code_file_name_len];
+            uint32     flags;
+            uint32     code_function_name_len;
+            char       code_function_name[code_function_name_len];
+        } Data_v3;
+
+        '''
+        if ODL.cparser is None:
+            from dissect import cstruct
+            cparser = cstruct.cstruct()
+            cparser.load(self.headers)
+            ODL.cparser = cparser
+            ODL.fast_path = self.verify_fast_path()
+        # Insertion ordered dicts used as sets, the comboboxes sort them
+        # into lists when they need them
+        self.code_file = {}
+        self.function = {}
+        self.flags = {}
+        self.index = {}
+        # Same keys as index -> array('Q') of the timestamp of each slice.
+        # Slices are kept in timestamp order so a time window is a binary
+        # search away.
+        self.times = {}
+        # Same keys -> payload statistics of every occurrence, sampled or
+        # not, laid out as empty_sizes
+        self.sizes = {}
+        self.log = None
+        self.buffer = None
+        self.view = None
+        # File holding the records that are mapped, and the inflated spool
+        # file to delete on close if it had to be named (see to_scan)
+        self.data_path = None
+        self.temp_path = None
+        # Inflated records of a gzipped log kept with its cache entry,
+        # mapped on a cache hit instead of inflating the log again
+        self.inflated_path = None
+        # Log a scan was loaded for, mapped on first use by map_log
+        self.filename = None
+        self.gzipped = False
+        self.odl_version = None
+        # Offsets and timestamps of every record_step-th record, built by
+        # index_records for seek_to_record and seek_to_time
+        self.record_offsets = None
+        self.record_times = None
+        self.record_step = 1
+        self.record_count = 0
+        # Directory of the index cache, None to always scan
+        self.cache_dir = None
+        # Most params slices kept per function, None to keep them all. Over
+        # the cap a uniform random sample of the occurrences is kept.
+        self.max_occurrences = None
+        self.params = ''
+        self.error = ''
+        # Progress of process_odl, polled by the GUI while it runs in a
+        # worker thread: (bytes done, bytes total) of the current stage
+        self.stage = ''
+        self.progress = (0, 0)
+        self.cancel = threading.Event()
+        # Profile timing the stages, None unless profiling was asked for
+        self.profile = None
+        # Held while the log is mapped or closed, which searches and
+        # background jobs may both ask for
+        self.map_lock = threading.RLock()
+
+    def close(self):
+        with self.map_lock:
+            self._close()
+
+    def _close(self):
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self.buffer is not None:
+            try:
+                self.buffer.close()
+            except BufferError:
+                # Params handed out to open tabs still reference the map,
+                # it is unmapped once the last of them is released and
+                # only then can the spool file be deleted on Windows.
+                if self.temp_path is not None:
+                    weakref.finalize(self.buffer, remove_spool, self.temp_path)
+            self.buffer = None
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+        if self.temp_path is not None:
+            remove_spool(self.temp_path)
+            self.temp_path = None
+        remove_stale_spools()
+        self.inflated_path = None
+        self.data_path = None
+        self.filename = None
+        self.record_offsets = None
+        self.record_times = None
+
+    def set_stage(self, stage):
+        """Move on to the next stage of loading the log, timing it when
+        profiling."""
+        self.stage = stage
+        if self.profile is not None:
+            self.profile.start(stage, self.filename)
+
+    def process_odl(self, filename, keep_inflated=False):
+        """Walk every record once, building the search catalog and an index
+        of (code_file, function, flags) -> array('Q') of offset, length
+        pairs of params slices.
+
+        Safe to run off the Tk thread: nothing here touches the GUI. Errors
+        are left in self.error, progress in self.stage and self.progress,
+        and the walk stops early once self.cancel is set.
+
+        With keep_inflated the inflated records of a gzipped log are
+        spooled to a named file, so the scan can be handed to another
+        process with to_scan.
+
+        With a cache_dir the catalog and index of a log scanned before are
+        read from the cache instead, as long as the log has not changed.
+        The inflated records of a gzipped log are kept there too, so a
+        cache hit needs neither a full decompress nor a parse."""
+        try:
+            self._process_odl(filename, keep_inflated)
+        finally:
+            if self.profile is not None:
+                self.profile.stop()
+
+    def _process_odl(self, filename, keep_inflated):
+        basename = os.path.basename(filename)
+        self.params = ''
+        self.close()
+        self.code_file.clear()
+        self.function.clear()
+        self.flags.clear()
+        self.index = {}
+        self.times = {}
+        self.sizes = {}
+        self.error = ''
+        self.progress = (0, 0)
+        self.filename = filename
+        self.gzipped = False
+        self.odl_version = None
+        self.set_stage('Opening')
+        try:
+            f = open(filename, 'rb')
+        except Exception as e:
+            self.error = f'{e}'
+            return
+        fingerprint = None
+        if self.cache_dir is not None:
+            fingerprint = self.fingerprint(f)
+            self.set_stage('Reading cache')
+            if self.read_cache(filename, fingerprint):
+                f.close()
+                if self.profile is not None:
+                    self.profile.count(functions=len(self.index))
+                # Mapped now rather than on first use, so a gzipped log whose
+                # inflated records were not kept is inflated here, off the
+                # Tk thread and cancellable
+                if not self.map_log(named=keep_inflated, cancel=self.cancel):
+                    # As when scanning, no catalog without its records, so
+                    # nothing is left to map on first use from the Tk thread
+                    error = self.error
+                    self.cancel_odl(basename)
+                    if not self.cancel.is_set():
+                        self.error = error
+                return
+        self.set_stage('Parsing header')
+        try:
+            header = self.cparser.Odl_header(f.read(0x100))
+        except Exception as e:
+            f.close()
+            self.error = f'Unable to parse {basename}. Not a valid log file.'
+            return
+        if header.signature == b'EBFGONED':  # Odl header
+            pass
+        else:
+            f.close()
+            self.error = f'Bad header signature'
+            return
+        signature = f.read(8)
+        if signature[0:4] == b'\x1F\x8B\x08\x00':  # gzip
+            # With a cache the inflated records are spooled next to it,
+            # to be kept with the cache entry (see write_cache)
+            spool_dir = None
+            if self.cache_dir is not None:
+                try:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    spool_dir = self.cache_dir
+                except OSError:
+                    pass
+            try:
+                f.seek(-8, 1)
+                inflated = self.inflate_log(f, named=keep_inflated or spool_dir is not None,
+                                            cancel=self.cancel, dir=spool_dir)
+            except InterruptedError:
+                f.close()
+                self.cancel_odl(basename)
+                return
+            except (zlib.error, EOFError, OSError) as e:
+                f.close()
+                self.error = f'..decompression error for file {basename}. {e}'
+                return
+            f.close()
+            f = inflated
+            self.gzipped = True
+            if keep_inflated or spool_dir is not None:
+                self.temp_path = f.name
+            signature = f.read(8)
+        # Keep the log mapped so searches can slice params straight out of it
+        self.log = f
+        if self.cancel.is_set():
+            self.cancel_odl(basename)
+            return
+        if signature != b'\xCC\xDD\xEE\xFF\0\0\0\0':  # CDEF header
+            self.error = f'{basename} wrong header! Did not find 0xCCDDEEFF'
+            return
+        pos = f.tell() - 8
+        try:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError) as e:
+            self.error = f'Unable to map {basename}. {e}'
+            return
+        self.data_path = self.temp_path or filename
+        self.view = view = memoryview(self.buffer)
+        end = len(view)
+        if header.odl_version not in (2, 3):
+            self.error = f'Unknown odl_version = {header.odl_version}'
+            return
+        self.odl_version = int(header.odl_version)
+        db_size = 32 if header.odl_version == 3 else 56  # odl complete header is 56 bytes
+        self.set_stage('Parsing')
+        self.progress = (pos, end)
+        start = pos
+        records = 0
+        next_update = pos + self.update_interval
+        # raw (code_file_name, flags, code_function_name) -> index slices,
+        # times and sizes, so names are only decoded the first time they
+        # are seen
+        seen = {}
+        if self.max_occurrences is not None:
+            cap = 2 * self.max_occurrences
+            sampler = random.Random(filename)
+        while pos < end:
+            if pos >= next_update:
+                if self.cancel.is_set():
+                    self.cancel_odl(basename)
+                    return
+                self.progress = (pos, end)
+                next_update = pos + self.update_interval
+            try:
+                signature, timestamp, data_len = self.read_data_block(view, pos, header.odl_version)
+            except Exception:
+                signature = None
+            if signature != 0xffeeddcc:
+                self.error = f'Unable to parse {basename} completely. Did not find 0xCCDDEEFF'
+                break
+            if pos + db_size + data_len > end:
+                self.error = f'Unable to parse {basename} completely. The last record is truncated'
+                break
+            records += 1
+            pos += db_size
+            data_end = pos + data_len
+            try:
+                code_file_name, flags, code_function_name, params_len = self.read_data(view, pos, data_end, header.odl_version)
+            except Exception as e:
+                self.error = f'Unable to parse {basename} completely. {type(e).__name__}'
+                break
+
+            if params_len:
+                record_key = (code_file_name, flags, code_function_name)
+                entry = seen.get(record_key)
+                if entry is None:
+                    entry = seen[record_key] = self.add_to_catalog(code_file_name, flags, code_function_name)
+                slices, times, sizes = entry
+                # Laid out as empty_sizes
+                sizes[0] += 1
+                sizes[3] += params_len
+                if params_len < sizes[1]:
+                    sizes[1] = params_len
+                if params_len > sizes[2]:
+                    sizes[2] = params_len
+                sizes[4 + params_len.bit_length()] += 1
+                if self.max_occurrences is None or len(slices) < cap:
+                    slices.extend((data_end - params_len, params_len))
+                    times.append(timestamp)
+                elif cap:
+                    # Reservoir sampling, every occurrence so far is kept
+                    # with the same probability
+                    replace = sampler.randrange(sizes[0])
+                    if replace < self.max_occurrences:
+                        slices[2 * replace] = data_end - params_len
+                        slices[2 * replace + 1] = params_len
+                        times[replace] = timestamp
+
+            pos = data_end
+        for slices, times, sizes in seen.values():
+            # Timestamps only go back when the clock did, or after sampling
+            if any(earlier > later for earlier, later in zip(times, islice(times, 1, None))):
+                self.sort_slices(slices, times)
+        self.progress = (end, end)
+        if self.profile is not None:
+            self.profile.count(bytes=pos - start, records=records, functions=len(seen))
+        if fingerprint is not None:
+            self.set_stage('Writing cache')
+            self.write_cache(filename, fingerprint)
+
+    def cancel_odl(self, basename):
+        """Throw away a partially processed log after a cancel."""
+        self.close()
+        self.code_file.clear()
+        self.function.clear()
+        self.flags.clear()
+        self.index = {}
+        self.times = {}
+        self.sizes = {}
+        self.error = f'Loading {basename} was cancelled.'
+
+    def add_to_catalog(self, code_file_name, flags, code_function_name):
+        """Add a newly seen function to the catalog and return its arrays of
+        params slices, timestamps and sizes."""
+        code_file_name = sys.intern(code_file_name.decode('utf8'))
+        code_function_name = sys.intern(code_function_name.decode('utf8'))
+        self.code_file[code_file_name] = None
+        self.function.setdefault(code_file_name, {})[code_function_name] = None
+        self.flags.setdefault(code_function_name, {})[flags] = None
+        key = (code_file_name.lower(), code_function_name.lower(), flags)
+        return (self.index.setdefault(key, array('Q')), self.times.setdefault(key, array('Q')),
+                self.sizes.setdefault(key, array('Q', self.empty_sizes)))
+
+    @staticmethod
+    def sort_slices(slices, times):
+        """Put the offset, length pairs of a function and their timestamps
+        in timestamp order, log order among equal timestamps."""
+        triples = sorted(zip(times, slices[::2], slices[1::2]))
+        times[:] = array('Q', [timestamp for timestamp, offset, length in triples])
+        slices[:] = array('Q', [value for timestamp, offset, length in triples for value in (offset, length)])
+
+    @staticmethod
+    def fingerprint(f):
+        """Return (size, mtime, content hash) identifying the contents of
+        the open log f. Only the first and last 64 KiB are hashed, which
+        covers the header and the most recently appended records."""
+        stat = os.fstat(f.fileno())
+        h = hashlib.sha1()
+        h.update(f.read(0x10000))
+        f.seek(max(0, stat.st_size - 0x10000))
+        h.update(f.read(0x10000))
+        f.seek(0)
+        return stat.st_size, stat.st_mtime_ns, h.hexdigest()
+
+    def cache_path(self, filename):
+        name = hashlib.sha1(os.path.normcase(os.path.abspath(filename)).encode('utf8')).hexdigest()
+        return os.path.join(self.cache_dir, f'{name}.cache')
+
+    @staticmethod
+    def read_cache_header(f):
+        """Return the JSON header of the open cache file f, leaving f at the
+        start of its arrays."""
+        if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+            raise ValueError('Not an index cache file')
+        header_len, = struct.unpack('<I', f.read(4))
+        return json.loads(f.read(header_len))
+
+    def read_cache(self, filename, fingerprint):
+        """Load the scan of filename from the cache if it is still valid."""
+        try:
+            with open(self.cache_path(filename), 'rb') as f:
+                cache = self.read_cache_header(f)
+                if (cache['version'] != CACHE_VERSION or cache['fingerprint'] != list(fingerprint)
+                        or cache['max_occurrences'] != self.max_occurrences):
+                    return False
+                data = memoryview(f.read())
+            swap = cache['byteorder'] != sys.byteorder
+            index = {}
+            times = {}
+            sizes = {}
+            pos = 0
+            for code_file_name, code_function_name, flags, slices_len, times_len in cache['keys']:
+                key = (code_file_name, code_function_name, flags)
+                for arrays, length in ((index, slices_len), (times, times_len), (sizes, len(self.empty_sizes))):
+                    values = array('Q')
+                    values.frombytes(data[pos:pos + 8 * length])
+                    if swap:
+                        values.byteswap()
+                    arrays[key] = values
+                    pos += 8 * length
+            if pos != len(data):
+                return False
+            code_file = dict.fromkeys(cache['code_file'])
+            function = {name: dict.fromkeys(names) for name, names in cache['function'].items()}
+            flags = {name: dict.fromkeys(values) for name, values in cache['flags'].items()}
+        except Exception:
+            return False
+        self.code_file = code_file
+        self.function = function
+        self.flags = flags
+        self.index = index
+        self.times = times
+        self.sizes = sizes
+        self.error = cache['error']
+        self.gzipped = cache['gzipped']
+        self.odl_version = cache['odl_version']
+        self.inflated_path = None
+        if self.gzipped and cache.get('inflated'):
+            name, size, mtime = cache['inflated']
+            path = self.spool_path(name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                pass
+            else:
+                if (stat.st_size, stat.st_mtime_ns) == (size, mtime):
+                    self.inflated_path = path
+        return True
+
+    def spool_path(self, name):
+        """Return the path of the inflated spool file name in the cache."""
+        return os.path.join(self.cache_dir, os.path.basename(name))
+
+    def write_cache(self, filename, fingerprint):
+        keys = list(self.index)
+        # The inflated records of a gzipped log spooled to the cache
+        # directory are kept with the entry, checked by size and mtime
+        inflated = None
+        if (self.gzipped and self.temp_path is not None
+                and os.path.dirname(os.path.abspath(self.temp_path)) == os.path.abspath(self.cache_dir)):
+            try:
+                stat = os.stat(self.temp_path)
+                inflated = [os.path.basename(self.temp_path), stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                pass
+        cache = {'version': CACHE_VERSION,
+                 'fingerprint': list(fingerprint),
+                 'max_occurrences': self.max_occurrences,
+                 'byteorder': sys.byteorder,
+                 'code_file': list(self.code_file),
+                 'function': {name: list(names) for name, names in self.function.items()},
+                 'flags': {name: list(values) for name, values in self.flags.items()},
+                 'keys': [[*key, len(self.index[key]), len(self.times[key])] for key in keys],
+                 'error': self.error,
+                 'gzipped': self.gzipped,
+                 'odl_version': self.odl_version,
+                 'inflated': inflated}
+        header = json.dumps(cache).encode('utf8')
+        path = self.cache_path(filename)
+        try:
+            with open(path, 'rb') as f:
+                replaced = self.read_cache_header(f).get('inflated')
+        except Exception:
+            replaced = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            f = tempfile.NamedTemporaryFile(dir=self.cache_dir, delete=False)
+        except OSError:
+            return
+        # Written aside and moved into place, so a reader never sees half
+        # a cache file
+        try:
+            with f:
+                f.write(CACHE_MAGIC + struct.pack('<I', len(header)) + header)
+                for key in keys:
+                    self.index[key].tofile(f)
+                    self.times[key].tofile(f)
+                    self.sizes[key].tofile(f)
+            os.replace(f.name, path)
+        except OSError:
+            try:
+                os.remove(f.name)
+            except OSError:
+                pass
+            return
+        if inflated is not None:
+            # Owned by the cache from now on, not deleted on close
+            self.inflated_path = self.temp_path
+            self.temp_path = None
+        if replaced and (inflated is None or replaced[0] != inflated[0]):
+            remove_spool(self.spool_path(replaced[0]))
+
+    def map_log(self, named=False, cancel=None):
+        """Map the records of a log whose scan came from the cache or that
+        was opened with open_log, after inflating them if the log is
+        gzipped. Returns whether params can be sliced from the log.
+
+        named spools the inflated records to a named file as in
+        process_odl, and inflating stops once the cancel Event is set.
+        On failure the reason is left in self.error and the log stays
+        unmapped, so mapping can be tried again."""
+        with self.map_lock:
+            if self.view is not None:
+                return True
+            if self.filename is None or self.odl_version is None:
+                return False
+            try:
+                f = None
+                if self.gzipped and self.inflated_path is not None:
+                    try:
+                        f = open(self.inflated_path, 'rb')
+                    except OSError:
+                        self.inflated_path = None
+                if f is None:
+                    f = open(self.filename, 'rb')
+                    if self.gzipped:
+                        with f:
+                            f.seek(0x100)
+                            f = self.inflate_log(f, named=named, cancel=cancel)
+                        if named:
+                            self.temp_path = f.name
+                self.log = f
+                self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (zlib.error, EOFError, ValueError, OSError) as e:
+                filename = self.filename
+                self.error = f'Unable to map {os.path.basename(filename)}. {e}'
+                self._close()
+                self.filename = filename
+                return False
+            if self.gzipped:
+                self.data_path = self.inflated_path or self.temp_path
+            else:
+                self.data_path = self.filename
+            self.view = memoryview(self.buffer)
+        if self.profile is not None:
+            self.profile.stop()
+        return True
+
+    def read_data_block(self, view, pos, odl_version):
+        """Return (signature, timestamp, data_len) of the Data_block at pos."""
+        if self.fast_path:
+            if odl_version == 3:
+                return self.data_block_v3.unpack_from(view, pos)
+            return self.data_block_v2.unpack_from(view, pos)
+        if odl_version == 3:
+            data_block = self.cparser.Data_block_V3(view[pos:pos + 32])
+        else:
+            data_block = self.cparser.Data_block_V2(view[pos:pos + 56])
+        return data_block.signature, data_block.timestamp, data_block.data_len
+
+    def read_data(self, view, pos, data_end, odl_version):
+        """Return (code_file_name, flags, code_function_name, params_len) of
+        the Data structure spanning view[pos:data_end]."""
+        if self.fast_path:
+            if odl_version == 3:
+                pos += 24  # unk1_guid, unk2, unk3
+            code_file_name_len, = self.name_len.unpack_from(view, pos)
+            pos += 4
+            code_file_name = bytes(view[pos:pos + code_file_name_len])
+            pos += code_file_name_len
+            flags, code_function_name_len = self.flags_name_len.unpack_from(view, pos)
+            pos += 8
+            code_function_name = bytes(view[pos:pos + code_function_name_len])
+            pos += code_function_name_len
+            if pos > data_end or pos > len(view):
+                raise EOFError('Read beyond end of Data')
+            return code_file_name, flags, code_function_name, data_end - pos
+        if odl_version == 3:
+            data = self.cparser.Data_v3(view[pos:data_end])
+            overhead = 36
+        else:
+            data = self.cparser.Data_v2(view[pos:data_end])
+            overhead = 12
+        params_len = (data_end - pos - data.code_file_name_len - data.code_function_name_len - overhead)
+        return data.code_file_name, data.flags, data.code_function_name, params_len
+
+    def verify_fast_path(self):
+        """Check the precompiled layouts against cstruct on a sample record
+        of each version. On any mismatch cstruct does all the parsing."""
+        sample = self.name_len.pack(4) + b'file' + self.flags_name_len.pack(7, 4) + b'func' + b'params'
+        data_v2 = sample
+        data_v3 = bytes(range(24)) + sample
+        block_v2 = struct.pack('<QQII16sIIII', 0xffeeddcc, 0x0123456789, 1, 2, bytes(range(16)), 3, 4, len(data_v2), 5)
+        block_v3 = struct.pack('<QQIIII', 0xffeeddcc, 0x0123456789, 1, 2, len(data_v3), 3)
+        self.fast_path = True
+        try:
+            checks = (
+                (2, self.data_block_v2, self.cparser.Data_block_V2, block_v2, self.cparser.Data_v2, data_v2),
+                (3, self.data_block_v3, self.cparser.Data_block_V3, block_v3, self.cparser.Data_v3, data_v3),
+            )
+            for odl_version, fast_block, cstruct_block, block, cstruct_data, data in checks:
+                cblock = cstruct_block(block)
+                cdata = cstruct_data(data)
+                if len(cstruct_block) != fast_block.size:
+                    return False
+                if self.read_data_block(block, 0, odl_version) != (cblock.signature, cblock.timestamp, cblock.data_len):
+                    return False
+                if self.read_data(memoryview(data), 0, len(data), odl_version) != (cdata.code_file_name, cdata.flags, cdata.code_function_name, 6):
+                    return False
+        except Exception:
+            return False
+        finally:
+            del self.fast_path  # back to the class attribute
+        return True
+
+    def inflate_log(self, f, chunk_size=0x100000, named=False, cancel=None, dir=None):
+        """Inflate the gzip stream in f into a temporary file.
+
+        Input is read and output produced at most chunk_size bytes at a
+        time, so memory use stays flat regardless of the log size. The
+        returned file is positioned at the start of the inflated data.
+        A named file, made in dir if one is given, is not deleted when it
+        is closed.
+
+        Raises InterruptedError once the cancel Event is set and EOFError
+        if the stream is cut short, never returning part of the records."""
+        z = zlib.decompressobj(31)
+        if named:
+            inflated = tempfile.NamedTemporaryFile(suffix='.odl', delete=False, dir=dir)
+        else:
+            inflated = tempfile.TemporaryFile()
+        self.set_stage('Inflating')
+        start = f.tell()
+        total = os.fstat(f.fileno()).st_size - start
+        try:
+            while not z.eof:
+                if cancel is not None and cancel.is_set():
+                    raise InterruptedError('Inflating was cancelled')
+                self.progress = (f.tell() - start, total)
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise EOFError('Compressed file ended before the end-of-stream marker was reached')
+                while chunk:
+                    inflated.write(z.decompress(chunk, chunk_size))
+                    chunk = z.unconsumed_tail
+            inflated.write(z.flush())
+            if self.profile is not None:
+                self.profile.count(compressed_bytes=f.tell() - start, bytes=inflated.tell())
+            inflated.seek(0)
+        except Exception:
+            inflated.close()
+            if named:
+                os.remove(inflated.name)
+            raise
+        return inflated
+
+    def slices(self, code_file, function, flags, start=None, end=None):
+        """Return the array of offset, length pairs of params slices of
+        function, only those logged from timestamp start up to, but not
+        including, end when either bound is given."""
+        try:
+            key = (code_file.lower(), function.lower(), int(flags))
+        except ValueError:
+            return array('Q')
+        slices = self.index.get(key, array('Q'))
+        if start is None and end is None:
+            return slices
+        first, last = self.time_window(key, start, end)
+        return slices[2 * first:2 * last]
+
+    def time_window(self, key, start=None, end=None):
+        """Return the range of slices of the function with index key that
+        were logged from timestamp start up to end."""
+        times = self.times.get(key, ())
+        first = 0 if start is None else bisect.bisect_left(times, start)
+        last = len(times) if end is None else bisect.bisect_left(times, end)
+        return first, max(first, last)
+
+    def time_span(self):
+        """Return the (first, last) timestamp of the indexed records, or
+        None when there are none."""
+        spans = [(times[0], times[-1]) for times in self.times.values() if times]
+        if not spans:
+            return None
+        return min(first for first, last in spans), max(last for first, last in spans)
+
+    def find_params(self, code_file, function, flags):
+        """Return a zero-copy view of the params of the record logged by
+        function with the latest timestamp, the last in the log among
+        equal ones (of the sampled ones with max_occurrences). Slices are
+        kept in timestamp order, so when the clock went back this need not
+        be the last record in the log."""
+        slices = self.slices(code_file, function, flags)
+        if not slices or not self.map_log():
+            return ''
+        offset, length = slices[-2:]
+        return self.view[offset:offset + length]
+
+    def iter_params(self, code_file, function, flags):
+        """Yield (offset, params view) of every record logged by function,
+        in timestamp order."""
+        slices = self.slices(code_file, function, flags)
+        if not slices or not self.map_log():
+            return
+        for offset, length in zip(slices[::2], slices[1::2]):
+            yield offset, self.view[offset:offset + length]
+
+    def open_log(self, filename):
+        """Open filename for records and the seeks without scanning it into
+        the catalog. Returns whether the records could be mapped, the
+        reason they could not is left in self.error."""
+        basename = os.path.basename(filename)
+        self.close()
+        self.code_file.clear()
+        self.function.clear()
+        self.flags.clear()
+        self.index = {}
+        self.times = {}
+        self.sizes = {}
+        self.error = ''
+        self.odl_version = None
+        try:
+            with open(filename, 'rb') as f:
+                header = f.read(0x104)
+        except OSError as e:
+            self.error = f'{e}'
+            return False
+        if len(header) < 0x100:
+            self.error = f'Unable to parse {basename}. Not a valid log file.'
+            return False
+        if header[:8] != b'EBFGONED':
+            self.error = 'Bad header signature'
+            return False
+        odl_version = int.from_bytes(header[8:12], 'little')
+        if odl_version not in (2, 3):
+            self.error = f'Unknown odl_version = {odl_version}'
+            return False
+        self.filename = filename
+        self.gzipped = header[0x100:0x104] == b'\x1F\x8B\x08\x00'
+        self.odl_version = odl_version
+        return self.map_log()
+
+    def records(self, start=None):
+        """Yield a Record for every record of the mapped log, in log order,
+        from the Data_block at offset start or from the first. Names are
+        only decoded the first time they are seen and params are views, so
+        records are cheap to skip. A malformed record ends the walk with
+        the reason in self.error."""
+        if not self.map_log():
+            return
+        view = self.view
+        odl_version = self.odl_version
+        db_size = 32 if odl_version == 3 else 56
+        pos = (0 if self.gzipped else 0x100) if start is None else start
+        end = len(view)
+        names = {}
+        while pos < end:
+            try:
+                signature, timestamp, data_len = self.read_data_block(view, pos, odl_version)
+            except Exception:
+                signature = None
+            if signature != 0xffeeddcc:
+                self.error = f'Did not find 0xCCDDEEFF at offset {pos:#x}'
+                return
+            data_end = pos + db_size + data_len
+            if data_end > end:
+                self.error = f'The record at offset {pos:#x} is truncated'
+                return
+            try:
+                code_file_name, flags, code_function_name, params_len = self.read_data(view, pos + db_size, data_end, odl_version)
+            except Exception as e:
+                self.error = f'Unable to parse the record at offset {pos:#x}. {type(e).__name__}'
+                return
+            key = (code_file_name, code_function_name)
+            decoded = names.get(key)
+            if decoded is None:
+                decoded = names[key] = (code_file_name.decode('utf8', 'replace'), code_function_name.decode('utf8', 'replace'))
+            yield Record(pos, timestamp, decoded[0], decoded[1], flags, view[data_end - params_len:data_end])
+            pos = data_end
+
+    def index_records(self, step=1):
+        """Note the offset and timestamp of every step-th record, walking
+        only the Data_blocks. Returns the number of records."""
+        self.record_offsets = array('Q')
+        self.record_times = array('Q')
+        self.record_step = step
+        self.record_count = 0
+        if not self.map_log():
+            return 0
+        view = self.view
+        odl_version = self.odl_version
+        db_size = 32 if odl_version == 3 else 56
+        pos = 0 if self.gzipped else 0x100
+        end = len(view)
+        count = 0
+        while pos < end:
+            try:
+                signature, timestamp, data_len = self.read_data_block(view, pos, odl_version)
+            except Exception:
+                break
+            if signature != 0xffeeddcc:
+                break
+            if pos + db_size + data_len > end:
+                self.error = f'The record at offset {pos:#x} is truncated'
+                break
+            if not count % step:
+                self.record_offsets.append(pos)
+                self.record_times.append(timestamp)
+            count += 1
+            pos += db_size + data_len
+        self.record_count = count
+        return count
+
+    def seek_to_record(self, n):
+        """Return an iterator of the records from the n-th on, counting from
+        0, or from the end when n is negative. Indexes the records first if
+        they are not yet."""
+        if self.record_offsets is None:
+            self.index_records()
+        if n < 0:
+            n += self.record_count
+        if not 0 <= n < self.record_count:
+            raise IndexError('record index out of range')
+        start = self.record_offsets[n // self.record_step]
+        return islice(self.records(start), n % self.record_step, None)
+
+    def seek_to_time(self, start=None, end=None):
+        """Yield the records logged from timestamp start up to, but not
+        including, end. Either bound may be None. Timestamps are assumed to
+        increase through the log, as they do while the client appends to
+        it, so the first record is found by binary search over the record
+        index and the walk stops at the first record at or past end."""
+        if self.record_offsets is None:
+            self.index_records()
+        if not self.record_offsets:
+            return
+        first = 0
+        if start is not None:
+            # The indexed record before the first one at or past start, as
+            # records between indexed ones may already be past start
+            first = max(0, bisect.bisect_left(self.record_times, start) - 1)
+        for record in self.records(self.record_offsets[first]):
+            if end is not None and record.timestamp >= end:
+                return
+            if start is None or record.timestamp >= start:
+                yield record
+
+    def find_patterns(self, patterns):
+        """Search the params of every record, sampled or not, for patterns,
+        (label, compiled bytes regex) pairs as made by compile_patterns.
+        Returns a Counter of (label, code_file, function, flags) -> hits.
+
+        Each regex runs over the whole mapped log and every match is placed
+        in its record through the record index, so records without a match
+        are never parsed. A match that starts before the params of its
+        record, or runs past them, is retried within the params."""
+        hits = collections.Counter()
+        try:
+            if self.record_offsets is None or self.record_step != 1:
+                self.set_stage('Indexing records')
+                self.index_records()
+            if not self.record_offsets:
+                return hits
+            self.set_stage('Searching params')
+            view = self.view
+            offsets = self.record_offsets
+            odl_version = self.odl_version
+            db_size = 32 if odl_version == 3 else 56
+            start = offsets[0]
+            end = len(view)
+            total = (end - start) * len(patterns)
+            names = {}
+            for done, (label, pattern) in enumerate(patterns):
+                done *= end - start
+                self.progress = (done, total)
+                next_update = start + self.update_interval
+                match = pattern.search(view, start)
+                while match is not None:
+                    if match.start() >= next_update:
+                        if self.cancel.is_set():
+                            self.error = 'Searching was cancelled.'
+                            return hits
+                        self.progress = (done + match.start() - start, total)
+                        next_update = match.start() + self.update_interval
+                    record = offsets[bisect.bisect_right(offsets, match.start()) - 1]
+                    signature, timestamp, data_len = self.read_data_block(view, record, odl_version)
+                    data_end = record + db_size + data_len
+                    if match.start() >= data_end:
+                        # Past the last record index_records could read
+                        break
+                    try:
+                        code_file_name, flags, code_function_name, params_len = self.read_data(view, record + db_size, data_end, odl_version)
+                    except Exception:
+                        params_len = 0
+                    params_start = data_end - params_len
+                    if not params_len:
+                        pos = data_end
+                    elif match.start() < params_start:
+                        pos = params_start
+                    else:
+                        if match.end() > data_end:
+                            match = pattern.search(view, match.start(), data_end)
+                        if match is not None:
+                            key = (code_file_name, code_function_name)
+                            decoded = names.get(key)
+                            if decoded is None:
+                                decoded = names[key] = (code_file_name.decode('utf8', 'replace'), code_function_name.decode('utf8', 'replace'))
+                            hits[label, decoded[0], decoded[1], flags] += 1
+                            # An empty match would be found again at the same spot
+                            pos = max(match.end(), match.start() + 1)
+                        else:
+                            pos = data_end
+                    match = pattern.search(view, pos) if pos < end else None
+            self.progress = (total, total)
+            if self.profile is not None:
+                self.profile.count(bytes=total, hits=sum(hits.values()))
+            return hits
+        finally:
+            if self.profile is not None:
+                self.profile.stop()
+
+    def to_scan(self):
+        """Return the results of process_odl(filename, keep_inflated=True)
+        as picklable data for load_scan, and close the log. Ownership of
+        the inflated spool file passes to whoever loads the scan."""
+        scan = {'filename': self.filename,
+                'gzipped': self.gzipped,
+                'odl_version': self.odl_version,
+                'data_path': self.data_path,
+                'temp_path': self.temp_path,
+                'code_file': self.code_file,
+                'function': self.function,
+                'flags': self.flags,
+                'index': self.index,
+                'times': self.times,
+                'sizes': self.sizes,
+                'error': self.error,
+                'profile': self.profile and self.profile.stages}
+        self.temp_path = None
+        self.close()
+        return scan
+
+    def load_scan(self, scan):
+        """Take over a scan made by to_scan, usually in another process."""
+        self.close()
+        self.code_file = scan['code_file']
+        self.function = scan['function']
+        self.flags = scan['flags']
+        self.index = scan['index']
+        self.times = scan['times']
+        self.sizes = scan['sizes']
+        self.error = scan['error']
+        self.temp_path = scan['temp_path']
+        self.filename = scan['filename']
+        self.gzipped = scan['gzipped']
+        self.odl_version = scan['odl_version']
+        if scan['data_path'] is None:
+            # The worker could not map it, mapped on first use
+            return
+        try:
+            self.log = open(scan['data_path'], 'rb')
+            self.buffer = mmap.mmap(self.log.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError) as e:
+            self.error = f'Unable to map {scan["data_path"]}. {e}'
+            self.index = {}
+            return
+        self.data_path = scan['data_path']
+        self.view = memoryview(self.buffer)
+
+
+def scan_log(filename, cache_dir=None, max_occurrences=None, trace_memory=None):
+    """Process one log in a worker process of ODLGroup.process_odls,
+    profiling it unless trace_memory is None."""
+    odl = ODL()
+    odl.cache_dir = cache_dir
+    odl.max_occurrences = max_occurrences
+    if trace_memory is not None:
+        odl.profile = Profile(trace_memory)
+    odl.process_odl(filename, keep_inflated=True)
+    return odl.to_scan()
+
+
+def discard_scan(future):
+    """Delete the spool file of a scan nobody is going to load."""
+    if not future.cancelled() and future.exception() is None:
+        temp_path = future.result()['temp_path']
+        if temp_path is not None:
+            remove_spool(temp_path)
+
+
+class ODLGroup:
+    """One or more logs opened together, searched through one catalog
+    merged from the catalogs of each log."""
+
+    def __init__(self, cache_dir=None, max_occurrences=None):
+        self.cache_dir = cache_dir
+        self.max_occurrences = max_occurrences
+        self.odls = []
+        self.code_file = {}
+        self.function = {}
+        self.flags = {}
+        self.params = ''
+        self.error = ''
+        self.cancel = threading.Event()
+        self.scanning = None
+        self._stage = ''
+        self._progress = (0, 0)
+        # (label, code_file, function, flags, hits) of the last find_patterns
+        self.matches = []
+        # DecodeReport of the last decode_logs
+        self.report = None
+        # Profile shared by the logs of the group, None unless profiling
+        self.profile = None
+
+    # While a single log is processed in this process its own progress is
+    # reported, otherwise the number of logs scanned so far. self.scanning
+    # is read once, the worker may reset it in between.
+    @property
+    def stage(self):
+        scanning = self.scanning
+        return scanning.stage if scanning else self._stage
+
+    @property
+    def progress(self):
+        scanning = self.scanning
+        return scanning.progress if scanning else self._progress
+
+    def measure(self, stage, log=None):
+        """Context manager timing a stage when profiling."""
+        if self.profile is None:
+            return contextlib.nullcontext()
+        return self.profile.measure(stage, log)
+
+    def close(self):
+        # Dropped first, params are a view into one of the logs
+        self.params = ''
+        for odl in self.odls:
+            odl.close()
+        self.odls = []
+        self.code_file = {}
+        self.function = {}
+        self.flags = {}
+        self.matches = []
+
+    def process_odls(self, filenames, max_workers=None):
+        """Process filenames, one per worker process when there are several.
+
+        Like ODL.process_odl this is meant to run off the Tk thread and
+        reports through self.error, self.stage, self.progress and
+        self.cancel."""
+        self.close()
+        self.error = ''
+        filenames = list(filenames)
+        if len(filenames) == 1:
+            odl = ODL()
+            odl.cache_dir = self.cache_dir
+            odl.max_occurrences = self.max_occurrences
+            odl.cancel = self.cancel
+            odl.profile = self.profile
+            self.scanning = odl
+            try:
+                odl.process_odl(filenames[0])
+            finally:
+                self.scanning = None
+            with self.measure('Merging catalog', filenames[0]):
+                self.add(odl)
+            self.error = odl.error
+            return
+
+        self._stage = 'Scanning'
+        self._progress = (0, len(filenames))
+        max_workers = min(len(filenames), max_workers or os.cpu_count() or 1)
+        import concurrent.futures
+        trace_memory = self.profile and self.profile.trace_memory
+        with self.measure('Scanning'):
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+            futures = [executor.submit(scan_log, filename, self.cache_dir, self.max_occurrences, trace_memory)
+                       for filename in filenames]
+            pending = set(futures)
+            while pending and not self.cancel.is_set():
+                done, pending = concurrent.futures.wait(pending, timeout=0.1)
+                self._progress = (len(futures) - len(pending), len(futures))
+        if pending:
+            for future in futures:
+                future.add_done_callback(discard_scan)
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.error = 'Loading was cancelled.'
+            return
+        executor.shutdown()
+
+        errors = []
+        for filename, future in zip(filenames, futures):
+            odl = ODL()
+            odl.profile = self.profile
+            try:
+                scan = future.result()
+                if self.profile is not None and scan['profile']:
+                    # Stages the workers ran, side by side with each other
+                    self.profile.stages.extend(scan['profile'])
+                with self.measure('Loading scan', filename):
+                    odl.load_scan(scan)
+            except Exception as e:
+                odl.error = f'{type(e).__name__}: {e}'
+            with self.measure('Merging catalog', filename):
+                self.add(odl)
+            if odl.error:
+                errors.append(f'{os.path.basename(filename)}: {odl.error}')
+        self.error = '\n'.join(errors)
+
+    def add(self, odl):
+        """Add a processed log, merging its catalog into the group's."""
+        self.odls.append(odl)
+        self.code_file.update(odl.code_file)
+        for code_file, functions in odl.function.items():
+            self.function.setdefault(code_file, {}).update(functions)
+        for function, flags in odl.flags.items():
+            self.flags.setdefault(function, {}).update(flags)
+
+    def find_params(self, code_file, function, flags):
+        """Return the params of the record logged by function with the
+        latest timestamp in the last of the logs, in the order they were
+        given, that logged it at all."""
+        for odl in reversed(self.odls):
+            params = odl.find_params(code_file, function, flags)
+            if params:
+                return params
+        return ''
+
+    def iter_params(self, code_file, function, flags):
+        for odl in self.odls:
+            yield from odl.iter_params(code_file, function, flags)
+
+    def occurrences(self, code_file, function, flags, start=None, end=None):
+        """Return the Occurrences of function, only those logged from
+        timestamp start up to end when either bound is given."""
+        return Occurrences([(odl, odl.slices(code_file, function, flags, start, end)) for odl in self.odls])
+
+    def catalog(self, start=None, end=None):
+        """Return the code_file, function and flags dicts of the catalog,
+        limited to the functions logged from timestamp start up to end when
+        either bound is given."""
+        if start is None and end is None:
+            return self.code_file, self.function, self.flags
+        code_file = {}
+        function = {}
+        flags = {}
+        for code_file_name, functions in self.function.items():
+            for code_function_name in functions:
+                for flag in self.flags.get(code_function_name, ()):
+                    key = (code_file_name.lower(), code_function_name.lower(), flag)
+                    for odl in self.odls:
+                        first, last = odl.time_window(key, start, end)
+                        if last > first:
+                            code_file[code_file_name] = None
+                            function.setdefault(code_file_name, {})[code_function_name] = None
+                            flags.setdefault(code_function_name, {})[flag] = None
+                            break
+        return code_file, function, flags
+
+    def time_span(self):
+        """Return the (first, last) timestamp over every log, or None."""
+        spans = [span for span in (odl.time_span() for odl in self.odls) if span]
+        if not spans:
+            return None
+        return min(first for first, last in spans), max(last for first, last in spans)
+
+    def payload_sizes(self):
+        """Return (code_file, function, flags) -> PayloadSizes of every
+        function in the catalog, counted over every log."""
+        sizes = {}
+        seen = set()
+        for code_file_name, functions in self.function.items():
+            for code_function_name in functions:
+                for flag in self.flags.get(code_function_name, ()):
+                    key = (code_file_name.lower(), code_function_name.lower(), flag)
+                    # Names differing only in case share their index key
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    payload = PayloadSizes()
+                    for odl in self.odls:
+                        if key in odl.sizes:
+                            payload.add(odl.sizes[key])
+                    if payload.count:
+                        sizes[code_file_name, code_function_name, flag] = payload
+        return sizes
+
+    def decode_logs(self, library, exporter=None, stage='Decoding'):
+        """Decode every record of every log with library, a StructLibrary,
+        leaving a DecodeReport in self.report and passing each record to
+        exporter, a RecordExporter, if one is given. Like process_odls this
+        is meant to run off the Tk thread."""
+        self.report = report = DecodeReport()
+        self.error = ''
+        errors = []
+        started = time.perf_counter()
+        for odl in self.odls:
+            odl.error = ''
+            odl.stage = stage
+            self.scanning = odl
+            try:
+                with self.measure(stage, odl.filename):
+                    if not odl.map_log(cancel=self.cancel):
+                        continue
+                    end = len(odl.view)
+                    records = report.records
+                    for count, decoded in enumerate(library.decode(odl.records(), report)):
+                        if exporter is not None:
+                            exporter.write(odl.filename, decoded)
+                        if not count & 0xfff:
+                            odl.progress = (decoded.record.offset, end)
+                            if self.cancel.is_set():
+                                odl.error = 'Decoding was cancelled.'
+                                break
+                    if self.profile is not None:
+                        self.profile.count(records=report.records - records)
+            except Exception as e:
+                odl.error = f'{type(e).__name__}: {e}'
+            finally:
+                self.scanning = None
+            if odl.error:
+                errors.append(f'{os.path.basename(odl.filename or "")}: {odl.error}')
+            if self.cancel.is_set():
+                break
+        report.seconds = time.perf_counter() - started
+        self.error = '\n'.join(errors)
+
+    def decode_dir(self, library, directory):
+        """Load the .cstruct files of directory into library, a
+        StructLibrary, then decode every record with it if any struct
+        loaded. Both are slow with a large library, so like decode_logs
+        this is meant to run off the Tk thread."""
+        self._stage = 'Loading structs'
+        self._progress = (0, 0)
+        with self.measure('Loading structs'):
+            library.load_dir(directory)
+        if library.structs and not self.cancel.is_set():
+            self.decode_logs(library)
+
+    def export_records(self, exporter, library=None):
+        """Write every record of every log to exporter, decoded with library
+        when one is given, and close it. Like process_odls this is meant to
+        run off the Tk thread."""
+        try:
+            self.decode_logs(library or StructLibrary(), exporter, 'Exporting')
+        finally:
+            try:
+                exporter.close()
+            except OSError as e:
+                self.error = '\n'.join(filter(None, [self.error, f'{exporter.filename}: {e}']))
+
+    def find_patterns(self, patterns):
+        """Search the params of every record of every log for patterns,
+        (label, bytes regex) pairs as returned by pattern_sources. Leaves
+        [(label, code_file, function, flags, hits)] in self.matches, most
+        hits first, and like process_odls is meant to run off the Tk
+        thread."""
+        self.matches = []
+        self.error = ''
+        try:
+            patterns = compile_patterns(patterns)
+        except ValueError as e:
+            self.error = f'{e}'
+            return
+        hits = collections.Counter()
+        errors = []
+        for odl in self.odls:
+            odl.cancel = self.cancel
+            odl.profile = self.profile
+            odl.error = ''
+            self.scanning = odl
+            try:
+                hits.update(odl.find_patterns(patterns))
+            except Exception as e:
+                odl.error = f'{type(e).__name__}: {e}'
+            finally:
+                self.scanning = None
+            if odl.error:
+                errors.append(f'{os.path.basename(odl.filename or "")}: {odl.error}')
+            if self.cancel.is_set():
+                break
+        self.error = '\n'.join(errors)
+        self.matches = sorted((key + (count,) for key, count in hits.items()),
+                              key=lambda match: (-match[4], match[0], match[1].lower(), match[2].lower(), match[3]))
+
+
+class Occurrences:
+    """Every params slice of a function across the logs of an ODLGroup, log
+    by log in the order they were given and in timestamp order within each.
+    Params views are only made when an occurrence is read."""
+
+    def __init__(self, parts):
+        self.parts = [(odl, slices) for odl, slices in parts if slices]
+        self.count = sum(len(slices) // 2 for odl, slices in self.parts)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for odl, slices in self.parts:
+            if not odl.map_log():
+                continue
+            for offset, length in zip(slices[::2], slices[1::2]):
+                yield odl.view[offset:offset + length]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('occurrence index out of range')
+        for odl, slices in self.parts:
+            if index < len(slices) // 2:
+                if not odl.map_log():
+                    return ''
+                offset, length = slices[2 * index:2 * index + 2]
+                return odl.view[offset:offset + length]
+            index -= len(slices) // 2
+
+
+class PayloadSizes:
+    """Occurrences and params lengths of a function, from the sizes array
+    ODL.sizes keeps for it in each log, merged with add."""
+
+    def __init__(self):
+        self.sizes = array('Q', ODL.empty_sizes)
+
+    def add(self, sizes):
+        self.sizes[0] += sizes[0]
+        self.sizes[1] = min(self.sizes[1], sizes[1])
+        self.sizes[2] = max(self.sizes[2], sizes[2])
+        self.sizes[3] += sizes[3]
+        for bucket in range(4, len(sizes)):
+            self.sizes[bucket] += sizes[bucket]
+
+    @property
+    def count(self):
+        return self.sizes[0]
+
+    @property
+    def smallest(self):
+        return self.sizes[1] if self.sizes[0] else 0
+
+    @property
+    def largest(self):
+        return self.sizes[2]
+
+    @property
+    def mean(self):
+        return self.sizes[3] / self.sizes[0] if self.sizes[0] else 0.0
+
+    @property
+    def fixed(self):
+        """Whether every occurrence has params of the same length."""
+        return self.sizes[0] > 0 and self.sizes[1] == self.sizes[2]
+
+    def histogram(self):
+        """Return (shortest, longest, occurrences) of every non-empty range
+        of params lengths, the ranges doubling in size."""
+        ranges = []
+        for bits, count in enumerate(self.sizes[4:]):
+            if count:
+                ranges.append((1 << bits >> 1, (1 << bits) - 1, count))
+        return ranges
+
+    def format_histogram(self):
+        return '  '.join(f'{low}:{count}' if low == high else f'{low}-{high}:{count}'
+                         for low, high, count in self.histogram())
+
+
+class StructCache:
+    """cstruct parsers with a definition loaded, keyed by the definition
+    with its whitespace normalized. The least recently used parser is
+    dropped once there are more than size."""
+
+    def __init__(self, size=64):
+        self.size = size
+        self.parsers = collections.OrderedDict()
+
+    def get(self, definition):
+        key = ' '.join(definition.split())
+        parser = self.parsers.get(key)
+        if parser is None:
+            from dissect import cstruct
+            parser = cstruct.cstruct()
+            parser.load(definition)
+            self.parsers[key] = parser
+            if len(self.parsers) > self.size:
+                self.parsers.popitem(last=False)
+        else:
+            self.parsers.move_to_end(key)
+        return parser
+
+
+class StructReport:
+    """Statistics of parsing many params samples with one compiled struct:
+    how many fail, how much of each sample the struct consumes and which
+    values every field takes."""
+
+    # Values listed per field in format()
+    top_values = 5
+
+    def __init__(self, structure, fields):
+        self.structure = structure
+        self.fields = fields
+        self.samples = 0
+        self.errors = collections.Counter()
+        # Bytes left over after parsing -> number of samples
+        self.leftover = collections.Counter()
+        self.values = {field: collections.Counter() for field in fields}
+
+    def add(self, sample):
+        self.samples += 1
+        stream = io.BytesIO(sample)
+        try:
+            parsed = self.structure(stream)
+        except Exception as e:
+            self.errors[type(e).__name__] += 1
+            return
+        self.leftover[len(sample) - stream.tell()] += 1
+        for field in self.fields:
+            value = getattr(parsed, field, None)
+            if isinstance(value, list):
+                value = tuple(value)
+            try:
+                self.values[field][value] += 1
+            except TypeError:
+                self.values[field][repr(value)] += 1
+
+    @staticmethod
+    def format_value(value):
+        return hex(value) if isinstance(value, int) else repr(value)
+
+    def format(self):
+        failed = sum(self.errors.values())
+        parsed = self.samples - failed
+        lines = [f'Samples:  {self.samples}',
+                 f'Failed:   {failed} ({100 * failed / (self.samples or 1):.1f}%)']
+        for error, count in self.errors.most_common():
+            lines.append(f'          {error}: {count}')
+        lines.append(f'Consumed: {self.leftover.get(0, 0)} of {parsed} parsed samples completely')
+        short = sorted(left for left in self.leftover if left)
+        if short:
+            lines.append(f'          {parsed - self.leftover.get(0, 0)} with {short[0]} to {short[-1]} bytes left over')
+        lines.append('')
+        for field, values in self.values.items():
+            lines.append(f'{field}: {len(values)} distinct')
+            for value, count in values.most_common(self.top_values):
+                lines.append(f'    {count:>8}  {self.format_value(value)}')
+            if len(values) > self.top_values:
+                numbers = [value for value in values if isinstance(value, int)]
+                if len(numbers) == len(values):
+                    lines.append(f'    range {hex(min(numbers))} to {hex(max(numbers))}')
+        return '\n'.join(lines)
+
+
+class StructLibrary:
+    """Dispatch table of the structs in a library of ODEFiles .cstruct
+    files, the format Lyman exports, keyed like the index by lowercased
+    (code_file, function, flags). Each file is loaded into a cstruct parser
+    of its own, so its structs are compiled once and may use each other's
+    types. What could not be loaded is listed in self.errors."""
+
+    # struct format characters of the cstruct types the fast path unpacks
+    packed_formats = {'int8': 'b', 'uint8': 'B', 'int16': 'h', 'uint16': 'H',
+                      'int32': 'i', 'uint32': 'I', 'int64': 'q', 'uint64': 'Q',
+                      'float': 'f', 'double': 'd'}
+
+    def __init__(self):
+        # key -> (struct name, struct type, field names, fast layout)
+        self.structs = {}
+        self.errors = []
+
+    def load_dir(self, directory):
+        """Load every .cstruct file in directory and below. Returns the
+        number of structs loaded."""
+        count = 0
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith('.cstruct'):
+                    count += self.load_file(os.path.join(root, name))
+        return count
+
+    def load_file(self, filename):
+        """Load the structs of one .cstruct file. Returns how many."""
+        import yaml
+        from dissect import cstruct
+        basename = os.path.basename(filename)
+        try:
+            with open(filename, encoding='utf-8') as f:
+                document = yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+            code_file = str(document['Code_File']).strip()
+            functions = document.get('Functions') or []
+        except (OSError, UnicodeDecodeError, yaml.YAMLError, TypeError, KeyError, AttributeError) as e:
+            self.errors.append(f'{basename}: not a cstruct file. {type(e).__name__}: {e}')
+            return 0
+        entries = []
+        for function in functions:
+            try:
+                function_name = str(function['Function']).strip()
+                flags = function.get('Flags', [])
+                flags = [int(flag) for flag in (flags if isinstance(flags, list) else [flags])]
+                definition = self.fill_template(str(function['Structure']), code_file, function_name,
+                                                str(function.get('Description') or ''))
+                struct_name = re.findall(r'struct\s+(\w+)\s*\{', definition)[-1]
+            except Exception as e:
+                name = function.get('Function', '?') if isinstance(function, dict) else '?'
+                self.errors.append(f'{basename}: {name}: {type(e).__name__}: {e}')
+                continue
+            entries.append((function_name, flags, definition, struct_name))
+        # Every load re-tokenizes from scratch, so the whole file is loaded
+        # at once and function by function only to find the one that fails
+        parser = cstruct.cstruct()
+        struct_names = [struct_name for function_name, flags, definition, struct_name in entries]
+        try:
+            if len(set(struct_names)) != len(struct_names):
+                raise ValueError('struct defined twice')
+            parser.load('\n'.join(definition for function_name, flags, definition, struct_name in entries))
+        except Exception:
+            parser = None
+        count = 0
+        for function_name, flags, definition, struct_name in entries:
+            try:
+                if parser is None:
+                    function_parser = cstruct.cstruct()
+                    function_parser.load(definition)
+                else:
+                    function_parser = parser
+                structure = function_parser.typedefs[struct_name]
+            except Exception as e:
+                self.errors.append(f'{basename}: {function_name}: {type(e).__name__}: {e}')
+                continue
+            fields = [field.name for field in structure.__fields__]
+            fast = self.fast_layout(structure, fields, function_parser.endian)
+            for flag in flags:
+                key = (code_file.lower(), function_name.lower(), flag)
+                if key in self.structs:
+                    self.errors.append(f'{basename}: {function_name} flags {flag} is already defined by '
+                                       f'{self.structs[key][0]}, replaced')
+                self.structs[key] = (struct_name, structure, fields, fast)
+            count += 1
+        return count
+
+    @staticmethod
+    def fill_template(structure, code_file, function, description):
+        """Fill the %s placeholders of an exported Structure, a #define of
+        the description and the struct name, the way ODEFiles does."""
+        name = re.sub(r'\W', '_', f'{code_file}_{function}')
+        values = iter((name, description.replace('"', "'"), name))
+        return re.sub(r'%s', lambda match: next(values, name), structure)
+
+    @classmethod
+    def fast_layout(cls, structure, fields, endian):
+        """Return (struct.Struct, values per field) unpacking a fixed-size
+        structure of numbers and arrays of numbers or char straight from
+        the params, or None if it has anything else. Only used when it
+        agrees with cstruct on a test pattern, like ODL.verify_fast_path."""
+        if structure.dynamic or not structure.size:
+            return None
+        layout = [endian]
+        counts = []
+        for field in structure.__fields__:
+            if field.bits:
+                return None
+            kinds = [kind.__name__ for kind in field.type.__mro__]
+            if 'CharArray' in kinds and isinstance(field.type.num_entries, int):
+                layout.append(f'{field.type.num_entries}s')
+                counts.append(0)
+            elif 'Array' in kinds and isinstance(field.type.num_entries, int) and field.type.type.__name__ in cls.packed_formats:
+                layout.append(f'{field.type.num_entries}{cls.packed_formats[field.type.type.__name__]}')
+                counts.append(field.type.num_entries)
+            elif 'Packed' in kinds and field.type.__name__ in cls.packed_formats:
+                layout.append(cls.packed_formats[field.type.__name__])
+                counts.append(0)
+            else:
+                return None
+        try:
+            layout = struct.Struct(''.join(layout))
+        except struct.error:
+            return None
+        if layout.size != structure.size:
+            return None
+        # Counts of 0 are single values, None when every field is one
+        fast = (layout, counts if any(counts) else None)
+        sample = bytes((7 * i + 1) & 0xff for i in range(layout.size))
+        try:
+            parsed = structure(sample)
+            expected = {field: getattr(parsed, field) for field in fields}
+        except Exception:
+            return None
+        return fast if cls.unpack(fast, fields, sample) == expected else None
+
+    @staticmethod
+    def unpack(fast, fields, params):
+        layout, counts = fast
+        values = layout.unpack_from(params)
+        if counts is None:
+            return dict(zip(fields, values))
+        decoded = {}
+        pos = 0
+        for field, count in zip(fields, counts):
+            if count:
+                decoded[field] = list(values[pos:pos + count])
+                pos += count
+            else:
+                decoded[field] = values[pos]
+                pos += 1
+        return decoded
+
+    def decode(self, records, report=None):
+        """Decode records, as yielded by ODL.records, with the struct of
+        their function. Yields a Decoded for every record, with fields None
+        when no struct matched or it failed to parse, and tallies each
+        outcome in report if one is given."""
+        if report is None:
+            report = DecodeReport()
+        unpack = self.unpack
+        unmatched = report.unmatched
+        # Names as the record has them -> entry of self.structs, so the
+        # lowercased key is only made once per function
+        lookup = {}
+        # Tallied locally and added to the report when the walk ends, or is
+        # abandoned
+        count = decoded = 0
+        try:
+            for record in records:
+                count += 1
+                names = (record.code_file, record.function, record.flags)
+                entry = lookup.get(names, False)
+                if entry is False:
+                    entry = lookup[names] = self.structs.get((record.code_file.lower(), record.function.lower(), record.flags))
+                if entry is None:
+                    unmatched[names] += 1
+                    yield Decoded(record, None, None, None)
+                    continue
+                struct_name, structure, fields, fast = entry
+                params = record.params
+                if fast is not None and len(params) >= fast[0].size:
+                    layout, counts = fast
+                    if counts is None:
+                        values = dict(zip(fields, layout.unpack_from(params)))
+                    else:
+                        values = unpack(fast, fields, params)
+                    consumed = layout.size
+                else:
+                    stream = io.BytesIO(params)
+                    try:
+                        parsed = structure(stream)
+                    except Exception as e:
+                        error = f'{type(e).__name__}: {e}'
+                        report.failed[names] += 1
+                        report.first_error.setdefault(names, error)
+                        yield Decoded(record, struct_name, None, error)
+                        continue
+                    values = {field: getattr(parsed, field) for field in fields}
+                    consumed = stream.tell()
+                decoded += 1
+                if consumed != len(params):
+                    report.leftover[names] += 1
+                yield Decoded(record, struct_name, values, None)
+        finally:
+            report.records += count
+            report.decoded += decoded
+
+
+class DecodeReport:
+    """Outcome of decoding logs with a StructLibrary: records decoded, the
+    functions no struct matched and those whose struct failed to parse or
+    left bytes of the params over, by (code_file, function, flags)."""
+
+    # Functions listed per outcome in format()
+    top_functions = 20
+
+    def __init__(self):
+        self.records = 0
+        self.decoded = 0
+        self.seconds = 0.0
+        self.unmatched = collections.Counter()
+        self.failed = collections.Counter()
+        self.first_error = {}
+        self.leftover = collections.Counter()
+
+    def format(self):
+        unmatched = sum(self.unmatched.values())
+        failed = sum(self.failed.values())
+        lines = [f'Records:   {self.records}',
+                 f'Decoded:   {self.decoded} ({100 * self.decoded / (self.records or 1):.1f}%)',
+                 f'Failed:    {failed}',
+                 f'Unmatched: {unmatched} records of {len(self.unmatched)} functions']
+        if self.seconds:
+            lines.append(f'Speed:     {self.records / self.seconds:,.0f} records/s')
+        for title, counter in (('Unmatched', self.unmatched), ('Failed', self.failed),
+                               ('Bytes left over', self.leftover)):
+            if not counter:
+                continue
+            lines += ['', f'{title}:']
+            for (code_file, function, flags), count in counter.most_common(self.top_functions):
+                error = self.first_error.get((code_file, function, flags), '') if counter is self.failed else ''
+                lines.append(f'    {count:>8}  {code_file} / {function} / {flags}  {error}'.rstrip())
+            if len(counter) > self.top_functions:
+                lines.append(f'    ... and {len(counter) - self.top_functions} more')
+        return '\n'.join(lines)
+
+
+class RecordExporter:
+    """Streams records, decoded or not, to a JSON Lines, CSV or Parquet
+    file as they are walked. Rows are buffered batch_size at a time and
+    written together, one row group each in Parquet, so memory stays the
+    same however big the log.
+
+    Every row has the log, offset, timestamp (milliseconds since the Unix
+    epoch, a UTC timestamp column in Parquet), code_file, function and
+    flags, then the params in hex or base64 unless params is 'none'. With
+    decoded set the struct name, its fields and the decoding error follow,
+    the fields as a JSON object, one JSON string per row in CSV and
+    Parquet as they differ from function to function."""
+
+    formats = ('jsonl', 'csv', 'parquet')
+    params_encodings = ('hex', 'base64', 'none')
+
+    def __init__(self, filename, format=None, params='hex', decoded=False, batch_size=10000):
+        if format is None:
+            format = self.guess_format(filename)
+        if format not in self.formats:
+            raise ValueError(f'unknown export format {format!r}')
+        if params not in self.params_encodings:
+            raise ValueError(f'unknown params encoding {params!r}')
+        self.filename = filename
+        self.format = format
+        self.params = params
+        self.decoded = decoded
+        self.batch_size = batch_size
+        self.columns = ['log', 'offset', 'timestamp', 'code_file', 'function', 'flags']
+        if params != 'none':
+            self.columns.append('params')
+        if decoded:
+            self.columns += ['struct', 'fields', 'error']
+        self.rows = []
+        self.count = 0
+        self.writer = None
+        # json.dumps with a default builds an encoder per call
+        self.encode = json.JSONEncoder(default=self.plain).encode
+        if format == 'parquet':
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise ImportError('Parquet export needs pyarrow, pip install pyarrow') from None
+            self.pyarrow = pyarrow
+            types = {'log': pyarrow.string(), 'offset': pyarrow.uint64(),
+                     'timestamp': pyarrow.timestamp('ms', tz='UTC'),
+                     'code_file': pyarrow.string(), 'function': pyarrow.string(),
+                     'flags': pyarrow.uint32(), 'params': pyarrow.string(),
+                     'struct': pyarrow.string(), 'fields': pyarrow.string(), 'error': pyarrow.string()}
+            self.schema = pyarrow.schema([(column, types[column]) for column in self.columns])
+            self.writer = pyarrow.parquet.ParquetWriter(filename, self.schema)
+            self.file = None
+        else:
+            self.file = open(filename, 'w', encoding='utf-8', newline='')
+            if format == 'csv':
+                import csv
+                self.writer = csv.writer(self.file)
+                self.writer.writerow(self.columns)
+
+    @staticmethod
+    def guess_format(filename):
+        extension = os.path.splitext(filename)[1].lower()
+        return {'.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet'}.get(extension, 'jsonl')
+
+    @staticmethod
+    def plain(value):
+        """JSON stand-in for the values cstruct parses that json does not
+        know: bytes as hex and nested structs as objects."""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value).hex()
+        fields = getattr(type(value), '__fields__', None)
+        if fields is not None:
+            return {field.name: getattr(value, field.name) for field in fields}
+        return repr(value)
+
+    def encode_params(self, params):
+        if self.params == 'hex':
+            return params.hex()
+        import base64
+        return base64.b64encode(params).decode('ascii')
+
+    def write(self, log, decoded):
+        """Add the Decoded, or the Record, decoded from log."""
+        record = decoded.record if isinstance(decoded, Decoded) else decoded
+        row = [log, record.offset, record.timestamp, record.code_file, record.function, int(record.flags)]
+        if self.params != 'none':
+            row.append(self.encode_params(record.params))
+        if self.decoded:
+            fields = decoded.fields
+            if fields is not None and self.format != 'jsonl':
+                fields = self.encode(fields)
+            row += [decoded.struct, fields, decoded.error]
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.format == 'jsonl':
+            columns = self.columns
+            encode = self.encode
+            self.file.write(''.join(encode(dict(zip(columns, row))) + '\n' for row in self.rows))
+        elif self.format == 'csv':
+            self.writer.writerows(self.rows)
+        else:
+            table = self.pyarrow.Table.from_arrays(
+                [self.pyarrow.array(column, type=self.schema.field(name).type)
+                 for name, column in zip(self.columns, zip(*self.rows))],
+                schema=self.schema)
+            # One row group per batch
+            self.writer.write_table(table, row_group_size=len(self.rows))
+        self.count += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self.format == 'parquet':
+                self.writer.close()
+            else:
+                self.file.close()
+
+
+class Profile:
+    """Opt-in record of where the time goes while logs load: the duration
+    of each stage, the counts (bytes, records, ...) the code running it
+    adds and, with trace_memory, the peak of Python allocations during it.
+    Stages are kept in the order they ran and are expected to run one at a
+    time within a process. Tracing allocations slows everything it
+    measures down several times over, so it is off by default."""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.current = None
+        self.started = 0.0
+
+    def start(self, stage, log=None):
+        """End the current stage and start timing the next."""
+        self.stop()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        self.current = {'stage': stage, 'log': log, 'seconds': 0.0}
+        self.started = time.perf_counter()
+
+    def count(self, **counts):
+        """Add counts to the current stage."""
+        if self.current is not None:
+            for name, value in counts.items():
+                self.current[name] = self.current.get(name, 0) + value
+
+    def stop(self):
+        if self.current is None:
+            return
+        self.current['seconds'] = time.perf_counter() - self.started
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.current['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        self.stages.append(self.current)
+        self.current = None
+
+    @contextlib.contextmanager
+    def measure(self, stage, log=None):
+        self.start(stage, log)
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    def close(self):
+        self.stop()
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def totals(self):
+        """Return stage -> seconds summed over every time it ran."""
+        totals = {}
+        for stage in self.stages:
+            totals[stage['stage']] = totals.get(stage['stage'], 0.0) + stage['seconds']
+        return totals
+
+    def to_json(self):
+        return json.dumps({'stages': self.stages, 'totals': self.totals()}, indent=2)
+
+    def format(self):
+        lines = [f'{"Stage":<16}{"Log":<28}{"Seconds":>9}{"Peak MB":>9}  Counts']
+        for stage in self.stages:
+            log = os.path.basename(stage['log'] or '')
+            peak = f'{stage["peak_bytes"] / 1e6:.1f}' if 'peak_bytes' in stage else ''
+            counts = ', '.join(f'{name} {value:,}' for name, value in stage.items()
+                               if name not in ('stage', 'log', 'seconds', 'peak_bytes'))
+            lines.append(f'{stage["stage"]:<16}{log[:27]:<28}{stage["seconds"]:>9.3f}{peak:>9}  {counts}')
+        lines.append('')
+        for stage, seconds in sorted(self.totals().items(), key=lambda item: -item[1]):
+            lines.append(f'{stage:<44}{seconds:>9.3f}')
+        return '\n'.join(lines)
+
+
+def format_time(timestamp):
+    """Format a record timestamp, milliseconds since the Unix epoch, as UTC."""
+    moment = datetime.datetime.fromtimestamp(timestamp / 1000, datetime.timezone.utc)
+    return moment.strftime('%Y-%m-%d %H:%M:%S.') + f'{timestamp % 1000:03d}'
+
+
+def parse_time(text):
+    """Parse a UTC time as format_time writes it, leaving out the
+    milliseconds, seconds or time of day as needed, into a record
+    timestamp. Raises ValueError on anything else."""
+    text = text.strip()
+    for pattern in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            moment = datetime.datetime.strptime(text, pattern)
+        except ValueError:
+            continue
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+        return int(moment.timestamp()) * 1000 + moment.microsecond // 1000
+    raise ValueError(f'unrecognized time {text!r}, expected YYYY-MM-DD HH:MM:SS.mmm')
+
+
+# How the text of a pattern for pattern_sources can be read. 'any' is every
+# one of the literal readings the text is valid for.
+PATTERN_KINDS = ('any', 'text', 'utf16', 'hex', 'guid', 'regex')
+
+
+def pattern_sources(kind, text):
+    """Return (label, bytes regex) pairs matching text read as kind, one of
+    PATTERN_KINDS. A reading with several spellings, like a GUID, has a
+    pair per spelling under the same label. Raises ValueError when text
+    cannot be read as kind."""
+    label = f'{kind} {text.strip()}'
+    if kind == 'any':
+        sources = []
+        for reading in ('text', 'utf16', 'hex', 'guid'):
+            try:
+                sources += pattern_sources(reading, text)
+            except ValueError:
+                pass
+        if not sources:
+            raise ValueError('empty pattern')
+        return sources
+    if kind == 'text':
+        literals = [text.encode('utf8')]
+    elif kind == 'utf16':
+        literals = [text.encode('utf-16-le')]
+    elif kind == 'hex':
+        literals = [bytes.fromhex(re.sub(r'\s|0x', '', text))]
+    elif kind == 'guid':
+        import uuid
+        guid = str(uuid.UUID(text.strip()))
+        # As stored by Windows, and spelled out in lower or upper case in
+        # ASCII or UTF-16LE
+        literals = [uuid.UUID(guid).bytes_le]
+        for spelling in (guid, guid.upper()):
+            literals += [spelling.encode('ascii'), spelling.encode('utf-16-le')]
+    elif kind == 'regex':
+        return [(label, text.encode('utf8'))]
+    else:
+        raise ValueError(f'unknown pattern kind {kind!r}')
+    if not literals[0]:
+        raise ValueError('empty pattern')
+    return [(label, re.escape(literal)) for literal in literals]
+
+
+def compile_patterns(patterns):
+    """Compile (label, bytes regex) pairs for ODL.find_patterns. Every regex
+    is kept on its own rather than joined into one alternation: re finds a
+    lone literal with a fast substring search but tries an alternation at
+    every offset, many times slower than a pass per literal. Raises
+    ValueError on a bad regex or one matching the empty string, which
+    would hit every byte."""
+    compiled = []
+    for label, source in patterns:
+        try:
+            # Params are binary, . matches any byte
+            pattern = re.compile(source, re.DOTALL)
+        except re.error as e:
+            raise ValueError(f'{label}: bad regex, {e}') from None
+        if pattern.fullmatch(b''):
+            raise ValueError(f'{label} matches the empty string')
+        compiled.append((label, pattern))
+    if not compiled:
+        raise ValueError('no patterns given')
+    return compiled
+
+
+def find_logs(paths):
+    """Expand the directories in paths to the ODL files they contain."""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(LOG_EXTENSIONS):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def read_targets(filename):
+    """Read CODE_FILE,FUNCTION,FLAGS targets, one per line."""
+    import csv
+    with open(filename, newline='', encoding='utf-8') as f:
+        return [[field.strip() for field in row] for row in csv.reader(f)
+                if row and not row[0].startswith('#')]
+
+
+def extract(odl, filename, targets, write):
+    """Scan filename once and pass every params blob logged by one of the
+    targets to write. Returns the number of blobs written."""
+    odl.process_odl(filename)
+    if odl.error:
+        print(f'{filename}: {odl.error}', file=sys.stderr)
+    count = 0
+    for code_file, function, flags in targets:
+        for offset, params in odl.iter_params(code_file, function, flags):
+            write(filename, code_file, function, flags, offset, params)
+            count += 1
+    odl.close()
+    return count
+
+
+def decode_logs(library, filenames, report):
+    """Decode every record of filenames with library, one log at a time
+    without building their catalogs, yielding (filename, Decoded)."""
+    odl = ODL()
+    for filename in filenames:
+        if odl.open_log(filename):
+            for decoded in library.decode(odl.records(), report):
+                yield filename, decoded
+        if odl.error:
+            print(f'{filename}: {odl.error}', file=sys.stderr)
+        odl.close()
+
+
+def load_library(directory):
+    """Load the .cstruct files in directory, reporting what could not be
+    loaded on stderr."""
+    library = StructLibrary()
+    count = library.load_dir(directory)
+    for error in library.errors:
+        print(error, file=sys.stderr)
+    print(f'{count} structs for {len(library.structs)} functions loaded from {directory}', file=sys.stderr)
+    return library
+
+
+def export_logs(filenames, exporter, library=None):
+    """Stream every record of filenames to exporter, decoded with library
+    when one is given. Returns the DecodeReport."""
+    report = DecodeReport()
+    started = time.perf_counter()
+    try:
+        for filename, decoded in decode_logs(library or StructLibrary(), filenames, report):
+            exporter.write(filename, decoded)
+    finally:
+        exporter.close()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def check_structs(directory, filenames):
+    """Decode every record of filenames with the .cstruct files in
+    directory and print what did and did not decode."""
+    library = load_library(directory)
+    report = DecodeReport()
+    started = time.perf_counter()
+    for filename, decoded in decode_logs(library, filenames, report):
+        pass
+    report.seconds = time.perf_counter() - started
+    print(report.format())
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Extract the params of OneDrive log entries without the GUI.')
+    parser.add_argument('logs', nargs='+', metavar='LOG',
+                        help='ODL file, or directory of ODL files')
+    parser.add_argument('-t', '--target', nargs=3, action='append', default=[],
+                        metavar=('CODE_FILE', 'FUNCTION', 'FLAGS'),
+                        help='function to extract, may be repeated')
+    parser.add_argument('-T', '--targets', metavar='FILE',
+                        help='file of CODE_FILE,FUNCTION,FLAGS lines to extract')
+    parser.add_argument('-f', '--format', choices=('jsonl', 'bin'), default='jsonl',
+                        help='JSON Lines with hex params, or one .bin file per params blob')
+    parser.add_argument('-o', '--output',
+                        help='output file for jsonl (default stdout), output directory for bin')
+    parser.add_argument('--max-occurrences', type=int, metavar='N',
+                        help='keep at most N randomly sampled params blobs per function and log')
+    parser.add_argument('--structs', metavar='DIR',
+                        help='instead of extracting targets, decode every record with the .cstruct files in DIR '
+                             'and report the records that did not decode, or decode the records exported with --export')
+    parser.add_argument('--export', metavar='FILE',
+                        help='instead of extracting targets, stream every record to FILE as JSON Lines, CSV or Parquet')
+    parser.add_argument('--export-format', choices=RecordExporter.formats,
+                        help='format of --export (default from its extension, else jsonl)')
+    parser.add_argument('--params', choices=RecordExporter.params_encodings, default='hex',
+                        help='encoding of the params in --export (default hex)')
+    parser.add_argument('--cache', metavar='DIR',
+                        help='keep the index of every scanned log in DIR and reuse it while the log is unchanged')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='write the time and counts of every loading stage to FILE as JSON')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='add the peak allocations of every stage to the profile, at the cost of much slower loading')
+    args = parser.parse_args(argv)
+
+    if args.export:
+        library = load_library(args.structs) if args.structs else None
+        try:
+            exporter = RecordExporter(args.export, args.export_format, args.params, library is not None)
+        except (ImportError, OSError) as e:
+            parser.error(f'{e}')
+        report = export_logs(find_logs(args.logs), exporter, library)
+        print(f'{exporter.count} records exported to {args.export} in {report.seconds:.1f}s', file=sys.stderr)
+        if library is not None:
+            print(report.format(), file=sys.stderr)
+        return 0
+    if args.structs:
+        check_structs(args.structs, find_logs(args.logs))
+        return 0
+
+    targets = args.target
+    if args.targets:
+        targets += read_targets(args.targets)
+    if not targets:
+        parser.error('no targets given, use -t or -T')
+    for target in targets:
+        if len(target) != 3 or not target[2].isdigit():
+            parser.error(f'bad target {",".join(target)}, expected CODE_FILE,FUNCTION,FLAGS')
+
+    if args.format == 'bin':
+        if not args.output:
+            parser.error('-o is required with -f bin')
+        os.makedirs(args.output, exist_ok=True)
+        out = None
+
+        def write(filename, code_file, function, flags, offset, params):
+            name = re.sub(r'[^\w.-]', '_', f'{os.path.basename(filename)}_{code_file}_{function}_{flags}_{offset:x}.bin')
+            with open(os.path.join(args.output, name), 'wb') as f:
+                f.write(params)
+    else:
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+
+        def write(filename, code_file, function, flags, offset, params):
+            out.write(json.dumps({'log': filename,
+                                  'code_file': code_file,
+                                  'function': function,
+                                  'flags': int(flags),
+                                  'offset': offset,
+                                  'params': params.hex()}) + '\n')
+
+    odl = ODL()
+    odl.cache_dir = args.cache
+    odl.max_occurrences = args.max_occurrences
+    if args.profile:
+        odl.profile = Profile(args.trace_memory)
+    logs = count = 0
+    try:
+        for filename in find_logs(args.logs):
+            count += extract(odl, filename, targets, write)
+            logs += 1
+    finally:
+        if out not in (None, sys.stdout):
+            out.close()
+        if odl.profile is not None:
+            odl.profile.close()
+            with open(args.profile, 'w', encoding='utf-8') as f:
+                f.write(odl.profile.to_json())
+    print(f'{count} params blobs from {logs} logs', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
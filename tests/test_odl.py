@@ -0,0 +1,171 @@
+"""Checks of the struct fast paths in odl.py against cstruct, on synthetic
+logs made by benchmarks/bench_odl.py, and of the walks built on them.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_odl import generate  # noqa: E402
+from odl import ODL, ODLGroup, StructLibrary, compile_patterns, pattern_sources  # noqa: E402
+
+RECORDS = 3000
+FUNCTIONS = 40
+
+
+def scan(path, fast_path=True):
+    odl = ODL()
+    if not fast_path:
+        odl.fast_path = False
+    odl.process_odl(path)
+    return odl
+
+
+@pytest.fixture(params=[(2, False), (2, True), (3, False), (3, True)],
+                ids=['v2', 'v2-gzip', 'v3', 'v3-gzip'])
+def log(request, tmp_path):
+    version, gzipped = request.param
+    path = str(tmp_path / (f'v{version}.odlgz' if gzipped else f'v{version}.odl'))
+    generate(path, version, RECORDS, code_files=5, functions=FUNCTIONS, params_size=16, gzipped=gzipped)
+    return path
+
+
+@pytest.fixture
+def plain_log(tmp_path):
+    path = str(tmp_path / 'v3.aodl')
+    generate(path, 3, RECORDS, code_files=5, functions=FUNCTIONS, params_size=16)
+    return path
+
+
+def test_fast_path_agrees_with_cstruct():
+    assert ODL().verify_fast_path()
+
+
+def test_catalog_matches_cstruct(log):
+    fast = scan(log)
+    slow = scan(log, fast_path=False)
+    assert not fast.error and not slow.error
+    assert fast.code_file == slow.code_file
+    assert fast.function == slow.function
+    assert fast.flags == slow.flags
+    assert fast.index == slow.index
+    assert fast.times == slow.times
+    assert fast.sizes == slow.sizes
+    # Records without params are not indexed
+    records = [record for record in fast.records() if len(record.params)]
+    assert sum(sizes[0] for sizes in fast.sizes.values()) == len(records)
+    for code_file, functions in fast.function.items():
+        for function in functions:
+            for flags in fast.flags[function]:
+                assert bytes(fast.find_params(code_file, function, flags)) == bytes(slow.find_params(code_file, function, flags))
+
+
+def test_records_match_catalog(log):
+    odl = scan(log)
+    records = list(odl.records())
+    assert len(records) == RECORDS and not odl.error
+    by_function = {}
+    for record in records:
+        if len(record.params):
+            key = (record.code_file.lower(), record.function.lower(), record.flags)
+            by_function.setdefault(key, []).append(bytes(record.params))
+    for (code_file, function, flags), params in by_function.items():
+        assert [bytes(view) for offset, view in odl.iter_params(code_file, function, flags)] == params
+
+
+def test_seeks(plain_log):
+    odl = ODL()
+    assert odl.open_log(plain_log)
+    records = list(odl.records())
+    assert odl.index_records(step=16) == RECORDS
+    for n in (0, 1, 15, 16, 17, RECORDS // 2, RECORDS - 1, -1):
+        assert next(odl.seek_to_record(n)) == records[n]
+    start, end = records[100].timestamp, records[200].timestamp
+    assert list(odl.seek_to_time(start, end)) == [record for record in records if start <= record.timestamp < end]
+
+
+def test_truncated_last_record(plain_log):
+    complete = scan(plain_log)
+    last = list(complete.records())[-1]
+    key = (last.code_file.lower(), last.function.lower(), last.flags)
+    complete.close()
+    with open(plain_log, 'r+b') as f:
+        f.truncate(os.path.getsize(plain_log) - 5)
+    for fast_path in (True, False):
+        odl = scan(plain_log, fast_path)
+        assert 'truncated' in odl.error
+        for function, slices in complete.index.items():
+            dropped = 2 if function == key and len(last.params) else 0
+            assert odl.index[function] == slices[:len(slices) - dropped]
+        for slices in odl.index.values():
+            for offset, length in zip(slices[::2], slices[1::2]):
+                assert offset + length <= len(odl.view)
+    odl = ODL()
+    assert odl.open_log(plain_log)
+    assert len(list(odl.records())) == RECORDS - 1 and 'truncated' in odl.error
+    assert odl.index_records() == RECORDS - 1
+
+
+def test_find_patterns_places_hits(log):
+    odl = scan(log)
+    records = list(odl.records())
+    # Bytes of a params, and function names, which are in every record but
+    # in no params, so a hit there must not be counted
+    sample = next(record for record in records if len(record.params) >= 4)
+    inside = bytes(sample.params[:4]).hex()
+    patterns = pattern_sources('hex', inside) + pattern_sources('regex', r'Function\d+')
+    group = ODLGroup()
+    group.process_odls([log])
+    group.find_patterns(patterns)
+    expected = {}
+    for label, source in compile_patterns(patterns):
+        for record in records:
+            hits = len(source.findall(bytes(record.params)))
+            if hits:
+                key = (label, record.code_file, record.function, record.flags)
+                expected[key] = expected.get(key, 0) + hits
+    assert {match[:4]: match[4] for match in group.matches} == expected
+    group.close()
+
+
+STRUCTS = '''Code_File: {code_file}
+Functions:
+    -
+        Function: {function}
+        Flags: [{flags}]
+        Structure: |
+            struct %s {{
+                uint16 small;
+                uint32 counts[2];
+                char tag[4];
+                int8 signed_byte;
+            }};
+'''
+
+
+def test_struct_fast_layout_matches_cstruct(log, tmp_path):
+    odl = scan(log)
+    code_file = next(iter(odl.code_file))
+    function = next(iter(odl.function[code_file]))
+    flags = next(iter(odl.flags[function]))
+    library_dir = tmp_path / 'structs'
+    library_dir.mkdir()
+    (library_dir / 'test.cstruct').write_text(STRUCTS.format(code_file=code_file, function=function, flags=flags))
+    library = StructLibrary()
+    assert library.load_dir(str(library_dir)) == 1 and not library.errors
+    key = (code_file.lower(), function.lower(), flags)
+    struct_name, structure, fields, fast = library.structs[key]
+    assert fast is not None
+    slow = StructLibrary()
+    slow.structs = {key: (struct_name, structure, fields, None)}
+    decoded = [(result.struct, result.fields, result.error) for result in library.decode(odl.records())]
+    expected = [(result.struct, result.fields, result.error) for result in slow.decode(odl.records())]
+    assert decoded == expected
+    # Params long enough for the fast layout and params too short for it
+    assert any(fields is not None for struct, fields, error in decoded)
+    assert any(error is not None for struct, fields, error in decoded)